@@ -0,0 +1,81 @@
+from html import escape
+from html.parser import HTMLParser
+
+
+# Elements that have no end tag
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input",
+                 "link", "meta", "source", "track", "wbr"}
+
+
+# AccordionParser is an incremental HTML parser that extracts the children of the first element
+# with the class "accordion" (on a weekly menu page, every child contains the menu of one day)
+# The page is fed in chunks as it is downloaded, and every child is passed to self.on_item
+# as soon as its end tag was read, re-serialized to HTML, so it can be parsed on its own
+# (see stw_parser.parse_day_html). The rest of the page is only tokenized
+# Unclosed elements are closed implicitly by the end tag of an enclosing element
+# Attributes:
+# - self.on_item - function(str), called with the HTML of every child of the accordion
+# - self.stack - list<str>, the names of the open elements
+# - self.accordion_depth - int, the length of self.stack inside the accordion (None before it)
+# - self.item - list<str>, the HTML of the child being read (None between the children)
+# - self.finished - bool, True after the end of the accordion
+class AccordionParser(HTMLParser):
+    def __init__(self, on_item):
+        super().__init__(convert_charrefs=False)
+        self.on_item = on_item
+        self.stack = []
+        self.accordion_depth = None
+        self.item = None
+        self.finished = False
+
+    # Returns True if the accordion was found
+    def found(self) -> bool:
+        return self.accordion_depth is not None
+
+    def handle_starttag(self, tag: str, attrs: list):
+        if self.finished:
+            return
+        if self.item is not None:
+            self.item.append(self.get_starttag_text())
+        elif self.found() and len(self.stack) == self.accordion_depth and tag not in VOID_ELEMENTS:
+            self.item = [self.get_starttag_text()]
+
+        if tag in VOID_ELEMENTS:
+            return
+        self.stack.append(tag)
+        if not self.found() and "accordion" in (dict(attrs).get("class") or "").split():
+            self.accordion_depth = len(self.stack)
+
+    # Self-closing tags like <br/> are kept as they are
+    def handle_startendtag(self, tag: str, attrs: list):
+        if self.item is not None:
+            self.item.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag: str):
+        # End tags of elements that aren't open are ignored
+        if self.finished or tag not in self.stack:
+            return
+        if self.item is not None:
+            self.item.append(f"</{tag}>")
+        while self.stack.pop() != tag:
+            pass
+
+        if not self.found():
+            return
+        if self.item is not None and len(self.stack) <= self.accordion_depth:
+            item, self.item = ''.join(self.item), None
+            self.on_item(item)
+        if len(self.stack) < self.accordion_depth:
+            self.finished = True
+
+    def handle_data(self, data: str):
+        if self.item is not None:
+            self.item.append(escape(data, quote=False))
+
+    def handle_entityref(self, name: str):
+        if self.item is not None:
+            self.item.append(f"&{name};")
+
+    def handle_charref(self, name: str):
+        if self.item is not None:
+            self.item.append(f"&#{name};")
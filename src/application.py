@@ -0,0 +1,597 @@
+import sys
+import time
+import signal
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from blessed import Terminal
+from grid import Grid
+from outputProfile import OutputProfile
+from frameWriter import FrameWriter
+from perfHud import PerfHud
+from perfCounters import counters
+from enums import Event
+from tracing import span
+from weekMatrix import WeekMatrix
+from usageStats import UsageStats
+from prefetcher import Prefetcher
+from menuGrid import MenuGrid
+from menuGridCache import MenuGridCache
+from menuRepository import MenuRepository
+from searchIndex import SearchIndex
+from searchView import SearchView
+from ui import (FOOTER_TEXT, NO_DAYS_TEXT, ERROR_MENU, screen, init_menu_grid, update_menu_grid, init_week_matrix,
+                show_search_results, set_day_tabs)
+from stw_parser import (get_week, get_all_weeks, cached_weeks, get_known_days, add_week_listener,
+                        remove_week_listener, raw_mensa, raw_date, formatted_mensa, FETCH_ERRORS)
+
+ARROW_KEYS = {"KEY_LEFT", "KEY_RIGHT", "KEY_UP", "KEY_DOWN"}
+
+# Keys that close the search view, and keys that delete the last character of the query
+CLOSE_SEARCH_KEYS = {"KEY_ESCAPE", "KEY_ENTER"}
+DELETE_KEYS = {"KEY_BACKSPACE", "KEY_DELETE"}
+
+# The maximal number of keys handled at once (see read_keys)
+MAX_KEYS_PER_FRAME = 64
+
+
+# Returns all keys pressed since the last call
+# Waits at most timeout seconds for the first key and returns an empty list if there is none
+# At most MAX_KEYS_PER_FRAME keys are returned, the rest is left for the next call
+def read_keys(term: Terminal, timeout: float) -> list:
+    keys = []
+    key = term.inkey(timeout=timeout)
+    while key:
+        keys.append(key)
+        if len(keys) == MAX_KEYS_PER_FRAME:
+            break
+        key = term.inkey(timeout=0)
+    return keys
+
+
+# Fetches the menu for the given canteen and day, runs in the thread pool of Application
+# on_day is called for every day of a downloaded page as soon as it is parsed (see stw_parser.get_week)
+def load_menu(mensa: str, date: tuple[int, int, int], on_day=None) -> list[str, str, int]:
+    with span("get_menu", mensa=mensa):
+        return get_week(mensa, on_day).get(date, [])
+
+
+# Application is the asyncio-based runtime of the TUI
+# Instead of one loop that polls the keyboard, fetches menus and renders in turn,
+# it runs several tasks concurrently:
+# - the input task handles keys as soon as the terminal has input
+# - - (where the terminal can't be watched, e.g. on Windows, the keyboard is polled instead)
+# - the render task renders a frame whenever the screen was invalidated
+# - the animation task periodically updates the widgets (needed for scrolling text)
+# - a fetch task downloads the selected menu in a thread pool, so the UI stays responsive
+# - - When a different day or canteen is selected, the previous fetch task is cancelled
+# - - (a download already running in the thread pool can't be interrupted: it finishes
+# - - in the background, and its week is cached for later)
+# - - A failed download doesn't end the program, an error is displayed instead of the menu
+# Built menu grids are kept in an LRU cache (see menuGridCache.py),
+# so that switching back to a recently viewed menu doesn't rebuild it
+# After a canteen was opened, the canteens likely to be opened next are prefetched (see prefetcher.py)
+# Menus are displayed from the last known data, even if it is outdated, while it is refreshed
+# in the background (see menuRepository.py). If a refreshed menu changed (compared by content hash),
+# the displayed menu grid is updated row by row (see update_menu_grid in ui.py),
+# and the footer shows how long ago the displayed menu was downloaded
+# day_tabs lists the days with a menu of the opened canteen. When another canteen is opened,
+# day_tabs is rebuilt from the known weeks (the weeks of all canteens are prefetched
+# after the start, see prefetcher.py), or after downloading the canteen's week,
+# so days without a menu are never fetched
+# The week view (see weekMatrix.py) replaces body_grid while toggled on
+# Its data is downloaded for all canteens at once the first time it is shown
+# The search view (see searchView.py) replaces the body while toggled on. Every downloaded week
+# is added to a search index (see searchIndex.py), which is searched on every typed key.
+# Opening the search view downloads the weeks of all canteens like the week view,
+# and the results are refreshed whenever another week was indexed
+# Attributes:
+# - self.term - OutputProfile, the terminal the UI is displayed in (see outputProfile.py)
+# - self.writer - FrameWriter, writes the frames to the terminal (see frameWriter.py)
+# - self.main_grid - Grid, the root of the widget tree (see build_ui in ui.py)
+# - self.body_grid, self.day_tabs, self.mensa_tabs, self.menu_grid - the labelled widgets
+# - self.menu_key - (str, (int, int, int)), the canteen and date of the menu in self.menu_grid
+# - self.days_mensa - str, the canteen (raw name) whose days are listed in self.day_tabs
+# - - (None before the first menu was displayed)
+# - self.selected_date - (int, int, int), the last day opened in self.day_tabs, it stays selected
+# - - while a canteen without menus is opened (see get_selection)
+# - self.footer - Widget, the footer that is swapped with self.hud
+# - self.hud - PerfHud, the performance HUD (see perfHud.py)
+# - self.week_matrix - WeekMatrix, the week view
+# - self.weeks_task - asyncio.Task, the task fetching the data for the week view (None if not started)
+# - self.days_task - asyncio.Task, the task prefetching the weeks of all canteens after the start
+# - - (None if not started)
+# - self.search_index - SearchIndex, the index of all downloaded weeks
+# - self.search_view - SearchView
+# - self.search_version - int, the version of self.search_index the displayed results are from
+# - self.search_return - Widget, the body displayed before the search view was opened
+# - self.executor - ThreadPoolExecutor, runs the blocking downloads
+# - self.menu_grids - MenuGridCache, the recently displayed menu grids
+# - self.usage_stats - UsageStats, counts how often each canteen is opened
+# - self.prefetcher - Prefetcher
+# - self.repository - MenuRepository, gives access to the menus
+# - self.show_age - bool, True if the footer shows the age of the displayed menu
+# - self.fetch_task - asyncio.Task, the task fetching the selected menu (None if there is none)
+# - self.last_frame - str, the frame displayed in the terminal (None if none was written yet)
+# - self.invalidated - asyncio.Event, set when a new frame needs to be rendered
+# - self.quit - asyncio.Event, set when the program should terminate
+# - self.error - Exception, the exception that terminated one of the tasks (None if there is none)
+class Application:
+    # Seconds between two animation steps
+    ANIMATION_INTERVAL = 0.05
+
+    # Seconds between two keyboard polls, if the terminal can't be watched
+    POLL_INTERVAL = 0.01
+
+    # Seconds the cursor has to rest on a tab before the menu is fetched,
+    # so that passing tabs while holding a key doesn't start downloads
+    SETTLE_DELAY = 0.05
+
+    # Maximal number of concurrent downloads
+    FETCH_WORKERS = 4
+
+    def __init__(self, term: OutputProfile, main_grid: Grid, writer=None, usage_stats=None,
+                 max_staleness=6 * 60 * 60, show_age=True):
+        self.term = term
+        self.writer = writer or FrameWriter(sys.stdout)
+        self.main_grid = main_grid
+        self.body_grid = main_grid.get_by_label("body")
+        self.day_tabs = self.body_grid.get_by_label("day_tabs")
+        self.mensa_tabs = self.body_grid.get_by_label("mensa_tabs")
+        self.menu_grid = self.body_grid.get_by_label("menu_grid")
+        self.menu_key = None
+        self.selected_date = None
+        self.days_mensa = self.get_selection()[0]
+        self.footer = main_grid.get_by_label("footer")
+        # The age of the menu in the footer changes every minute
+        self.footer.set_parameter("cached_layout", False)
+        self.hud = PerfHud(0, 0, counters)
+        self.week_matrix = WeekMatrix(0, 0)
+        self.week_matrix.set_parameters({
+            "active_background": (0, 0, 255),
+            "inactive_background": (255, 255, 255),
+            "active_text": (255, 255, 255),
+            "inactive_text": (0, 0, 0)
+        })
+        self.weeks_task = None
+        self.days_task = None
+        self.search_index = SearchIndex()
+        # Weeks downloaded before the start are indexed as well, the rest when they are downloaded
+        for mensa, (fetched, week) in cached_weeks().items():
+            self.search_index.add_week(mensa, week)
+        self.search_view = SearchView(0, 0)
+        self.search_version = None
+        self.search_return = None
+        self.executor = ThreadPoolExecutor(max_workers=self.FETCH_WORKERS)
+        self.menu_grids = MenuGridCache()
+        self.usage_stats = usage_stats or UsageStats()
+        self.prefetcher = Prefetcher(self.run_blocking, self.usage_stats)
+        self.repository = MenuRepository(self.run_blocking, max_staleness)
+        self.show_age = show_age
+        self.fetch_task = None
+        self.last_frame = None
+        self.invalidated = asyncio.Event()
+        self.quit = asyncio.Event()
+        self.error = None
+
+    # Returns the raw name of the opened canteen and the opened day as (day, month, year)
+    # While the opened canteen has no menus, day_tabs lists no days and the previously opened day
+    # is returned, so it is opened again in the next canteen (today if no day was opened yet)
+    def get_selection(self) -> tuple[str, tuple[int, int, int]]:
+        mensa = raw_mensa(self.mensa_tabs.get_cell(*self.mensa_tabs.get_opened_cell()).get_text())
+        text = self.day_tabs.get_cell(*self.day_tabs.get_opened_cell()).get_text()
+        if text != NO_DAYS_TEXT or self.selected_date is None:
+            self.selected_date = raw_date(text)
+        return mensa, self.selected_date
+
+    # Runs the application until the user quits
+    def run(self) -> int:
+        return asyncio.run(self.run_async())
+
+    # Starts the tasks and waits until the user quits, then shuts everything down
+    async def run_async(self) -> int:
+        loop = asyncio.get_running_loop()
+
+        # Resizes are rendered immediately where the terminal signals them
+        try:
+            loop.add_signal_handler(signal.SIGWINCH, self.invalidate)
+        except (AttributeError, NotImplementedError, RuntimeError):
+            pass
+
+        add_week_listener(self.search_index.add_week)
+        tasks = [self.start_task(self.read_input()),
+                 self.start_task(self.render_loop()),
+                 self.start_task(self.animate())]
+        self.update()
+        self.invalidate()
+        self.prefetch()
+        self.days_task = self.start_task(self.prefetcher.prefetch_all(self.tab_mensas()))
+
+        try:
+            await self.quit.wait()
+        finally:
+            remove_week_listener(self.search_index.add_week)
+            self.prefetcher.cancel()
+            self.repository.cancel()
+            self.usage_stats.save()
+            tasks += [task for task in (self.fetch_task, self.weeks_task, self.days_task) if task is not None]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            try:
+                loop.remove_signal_handler(signal.SIGWINCH)
+            except (AttributeError, NotImplementedError, RuntimeError):
+                pass
+
+        if self.error is not None:
+            raise self.error
+        return 0
+
+    # Creates a task for the coroutine
+    # If the task fails, the application is terminated and the exception is reraised by self.run
+    # (failed downloads are handled by the tasks themselves, see fetch_menu)
+    def start_task(self, coroutine) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coroutine)
+        task.add_done_callback(self.on_task_done)
+        return task
+
+    def on_task_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.error = task.exception()
+            self.quit.set()
+
+    # Requests a new frame to be rendered
+    def invalidate(self):
+        self.invalidated.set()
+
+    # Handles the keyboard input
+    # Watches the terminal's file descriptor if possible, polls the keyboard otherwise
+    async def read_input(self):
+        loop = asyncio.get_running_loop()
+        fd = getattr(self.term, "_keyboard_fd", None)
+        if fd is not None:
+            try:
+                loop.add_reader(fd, self.on_input)
+            except (NotImplementedError, ValueError, OSError):
+                fd = None
+
+        if fd is not None:
+            try:
+                await loop.create_future()
+            finally:
+                loop.remove_reader(fd)
+
+        while True:
+            self.handle_keys(read_keys(self.term, 0))
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    # Called when the terminal has input
+    def on_input(self):
+        keys = read_keys(self.term, 0)
+        self.handle_keys(keys)
+        # The remaining keys are already buffered, so the file descriptor won't signal them
+        if len(keys) == MAX_KEYS_PER_FRAME:
+            asyncio.get_running_loop().call_soon(self.on_input)
+
+    # Handles the given keys at once, so that held keys don't queue up
+    # and move the cursor after being released
+    def handle_keys(self, keys: list):
+        if len(keys) == 0:
+            return
+
+        for key in keys:
+            if self.search_shown():
+                self.edit_query(key)
+            elif key == 'q':
+                self.quit.set()
+                return
+            elif key == '/':
+                self.toggle_search()
+            elif key == 'p':
+                self.main_grid.set_cell(0, 2, self.footer if self.hud_shown() else self.hud)
+            elif key == 'w':
+                self.toggle_week_view()
+            elif key.name in ARROW_KEYS:
+                self.main_grid.move_cursor(key.name)
+
+        # Updates the offsets of the grids, so that the cursor stays visible
+        self.update()
+
+        # VALUE_CHANGED forwarded by body_grid signalises that
+        # either a different day or a different canteen was selected
+        # (only the tabs utilise event handling)
+        with span("get_event"):
+            if self.body_grid.get_event() == Event.VALUE_CHANGED:
+                self.request_menu()
+
+        self.invalidate()
+
+    def hud_shown(self) -> bool:
+        return self.main_grid.get_cell(0, 2) is self.hud
+
+    # Swaps body_grid and the week view
+    # The data for the week view is fetched when it is shown for the first time
+    def toggle_week_view(self):
+        if self.main_grid.get_cell(0, 1) is self.week_matrix:
+            self.main_grid.set_cell(0, 1, self.body_grid)
+            return
+
+        self.main_grid.set_cell(0, 1, self.week_matrix)
+        if self.weeks_task is None:
+            self.weeks_task = self.start_task(self.fetch_weeks())
+
+    def search_shown(self) -> bool:
+        return self.main_grid.get_cell(0, 1) is self.search_view
+
+    # Shows the search view in place of the body, or the previous body again
+    # The weeks of all canteens are fetched when the search view is shown for the first time,
+    # so that all of them can be searched
+    def toggle_search(self):
+        if self.search_shown():
+            self.main_grid.set_cell(0, 1, self.search_return)
+            return
+
+        self.search_return = self.main_grid.get_cell(0, 1)
+        self.main_grid.set_cell(0, 1, self.search_view)
+        self.search_view.set_query(self.search_view.get_query())
+        self.search()
+        if self.weeks_task is None:
+            self.weeks_task = self.start_task(self.fetch_weeks())
+
+    # Edits the query of the search view with the given key and searches for the new query
+    def edit_query(self, key):
+        query = self.search_view.get_query()
+        if key.name in CLOSE_SEARCH_KEYS:
+            self.toggle_search()
+            return
+        if key.name in DELETE_KEYS:
+            query = query[:-1]
+        elif not key.is_sequence and key.isprintable():
+            query += key
+        else:
+            return
+        self.search_view.set_query(query)
+        self.search()
+
+    # Displays the results for the query of the search view
+    def search(self):
+        query = self.search_view.get_query()
+        self.search_version = self.search_index.version
+        if query.strip() == "":
+            self.search_view.set_results(["Type to search the dishes of all canteens, "
+                                          "press Enter or Escape to close the search"])
+            return
+
+        start = time.perf_counter()
+        with span("search", query=query):
+            results = self.search_index.search(query)
+        show_search_results(self.search_view, results, time.perf_counter() - start)
+
+    # Fetches the menus of all canteens concurrently and fills the week view with them
+    async def fetch_weeks(self):
+        weeks = await self.run_blocking(get_all_weeks)
+        with span("init_week_matrix"):
+            init_week_matrix(self.week_matrix, {formatted_mensa(mensa): week for mensa, week in weeks.items()})
+        self.invalidate()
+
+    # Updates the displayed body (needed for scrolling the menu text, menu_grid and the tabs)
+    def update(self):
+        with span("update"):
+            self.main_grid.get_cell(0, 1).update()
+            # The results are refreshed after another week was indexed
+            if self.search_shown() and self.search_version != self.search_index.version:
+                self.search()
+            if self.hud_shown():
+                self.hud.update()
+            else:
+                self.update_footer()
+
+    # Shows how long ago the displayed menu was downloaded in the footer
+    def update_footer(self):
+        age = self.repository.get_age(self.get_selection()[0]) if self.show_age else None
+        if age is None:
+            text = FOOTER_TEXT
+        elif age < 60:
+            text = FOOTER_TEXT + " | updated just now"
+        else:
+            text = FOOTER_TEXT + f" | updated {int(age // 60)} min ago"
+        if text != self.footer.get_text():
+            self.footer.set_text(text)
+
+    # Periodically updates the widgets, e.g. for text scrolling
+    async def animate(self):
+        while True:
+            await asyncio.sleep(self.ANIMATION_INTERVAL)
+            self.update()
+            self.invalidate()
+
+    # Renders a frame every time the screen was invalidated
+    # Multiple invalidations between two frames result in a single frame
+    async def render_loop(self):
+        while True:
+            await self.invalidated.wait()
+            self.invalidated.clear()
+            self.render()
+
+    # Renders the screen and prints it in the terminal
+    def render(self):
+        term = self.term
+
+        # Resizes the UI based on the new size of the window
+        if (term.width, term.height) != self.main_grid.get_size():
+            self.main_grid.set_size(term.width, term.height)
+
+        # Renders the screen and prints it in the terminal,
+        # beginning from the top-right position ("home")
+        # If the frame exceeds the frame budget, it is rendered again with fewer colors
+        # (and with more colors again once frames are well under the budget, see OutputProfile.fit_budget)
+        # Without a budget, the frame is only encoded by the writer
+        render_start = time.perf_counter()
+        data = None
+        with span("screen"):
+            frame = term.home + screen(self.main_grid, term)
+            if term.frame_budget > 0:
+                data = frame.encode()
+                while term.fit_budget(len(data)):
+                    frame = term.home + screen(self.main_grid, term)
+                    data = frame.encode()
+        render_time = time.perf_counter() - render_start
+
+        # A frame equal to the displayed one is not written again
+        if frame == self.last_frame:
+            return
+        self.last_frame = frame
+        with span("write", characters=len(frame)):
+            frame_bytes = self.writer.write(frame, data)
+        counters.record_frame(render_time, frame_bytes, self.writer.writes)
+
+    # Starts fetching the menu for the selected day and canteen
+    # An unfinished fetch of a previously selected menu is cancelled
+    def request_menu(self):
+        if self.fetch_task is not None:
+            self.fetch_task.cancel()
+        self.fetch_task = self.start_task(self.fetch_menu(*self.get_selection()))
+
+    # Fetches the menu for the given canteen and day and redraws menu_grid with it
+    # If the menu can't be downloaded, ERROR_MENU is displayed instead (it isn't cached,
+    # so opening the menu again retries the download)
+    async def fetch_menu(self, mensa: str, date: tuple[int, int, int]):
+        try:
+            await self.open_menu(mensa, date)
+        except FETCH_ERRORS:
+            self.show_menu_grid(self.build_menu_grid(ERROR_MENU), (mensa, date))
+
+    # Displays the menu for the given canteen and day, downloading it if needed
+    # The last known menu is displayed without fetching (from a cached menu grid if possible)
+    # and refreshed in the background if it is outdated
+    async def open_menu(self, mensa: str, date: tuple[int, int, int]):
+        await asyncio.sleep(self.SETTLE_DELAY)
+        # Only opening another canteen counts, not switching between its days
+        if mensa != self.days_mensa:
+            self.usage_stats.record(mensa)
+
+        # Another canteen was opened, so day_tabs has to list its days
+        # If they aren't known yet, they are listed after the download of the canteen's week
+        if mensa != self.days_mensa and get_known_days(mensa) is not None:
+            days = get_known_days(mensa)
+            self.set_days(mensa, days, date)
+            # No day is opened, so the empty menu isn't cached for the selected date
+            if len(days) == 0:
+                self.show_menu_grid(self.build_menu_grid([]), (mensa, date))
+                return
+            date = self.get_selection()[1]
+
+        week = self.repository.get_week(mensa)
+        if week is None:
+            if not await self.download_menu(mensa, date):
+                return
+            if mensa != self.days_mensa:
+                self.set_days(mensa, get_known_days(mensa) or [], date)
+                # The selected day has no menu, the day opened instead is displayed
+                if self.get_selection()[1] != date:
+                    date = self.get_selection()[1]
+                    self.set_menu(mensa, date, get_week(mensa).get(date, []))
+        else:
+            menu_grid = self.menu_grids.get((mensa, date), week)
+            if menu_grid is not None:
+                self.show_menu_grid(menu_grid, (mensa, date))
+            else:
+                self.set_menu(mensa, date, week.get(date, []))
+            self.repository.revalidate(mensa, self.on_week_refreshed)
+        self.prefetch()
+
+    # Lists the given days of the given canteen in day_tabs, keeping the given date opened if possible
+    def set_days(self, mensa: str, days: list[tuple[int, int, int]], date: tuple[int, int, int]):
+        with span("set_day_tabs", days=len(days)):
+            set_day_tabs(self.day_tabs, days, date)
+        self.days_mensa = mensa
+        self.update()
+        self.invalidate()
+
+    # Called when a week was refreshed in the background
+    # The displayed and the cached menu grids of the canteen are updated in place
+    def on_week_refreshed(self, mensa: str, old_week: dict, new_week: dict):
+        for key in [key for key in self.menu_grids.entries if key[0] == mensa]:
+            self.refresh_menu_grid(self.menu_grids.entries[key][0], new_week.get(key[1], []))
+            self.menu_grids.revalidate(key, new_week)
+
+        if self.menu_key is not None and self.menu_key[0] == mensa:
+            self.refresh_menu_grid(self.menu_grid, new_week.get(self.menu_key[1], []))
+        self.invalidate()
+
+    # Updates a menu grid with the given menu, if its content changed
+    @staticmethod
+    def refresh_menu_grid(menu_grid: MenuGrid, menu: list[str, str, int]):
+        if menu_grid.menu_hash != MenuGrid.content_hash(menu):
+            with span("update_menu_grid", rows=len(menu)):
+                update_menu_grid(menu_grid, menu)
+
+    # Downloads the menu for the given canteen and day and displays it
+    # The menu is displayed as soon as its day is parsed, while the rest of the page is still loading
+    # Returns False if the download failed after the menu was displayed
+    async def download_menu(self, mensa: str, date: tuple[int, int, int]) -> bool:
+        loop = asyncio.get_running_loop()
+        early_menu = loop.create_future()
+
+        # Called in the thread pool for every parsed day
+        def on_day(day: tuple[int, int, int], menu: list[str, str, int]):
+            if day == date:
+                try:
+                    loop.call_soon_threadsafe(lambda: early_menu.done() or early_menu.set_result(menu))
+                except RuntimeError:  # The event loop was closed in the meantime
+                    pass
+
+        load = loop.create_task(self.run_blocking(load_menu, mensa, date, on_day))
+        try:
+            await asyncio.wait([early_menu, load], return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            load.cancel()
+            raise
+
+        if not early_menu.done():
+            self.set_menu(mensa, date, await load)
+            return True
+        menu_grid = self.build_menu_grid(early_menu.result())
+        self.show_menu_grid(menu_grid, (mensa, date))
+        try:
+            await load
+        except FETCH_ERRORS:
+            # The day was parsed before the download failed, so it stays displayed, but isn't cached
+            return False
+        self.menu_grids.put((mensa, date), menu_grid, self.repository.get_week(mensa))
+        return True
+
+    # Builds a menu grid for the given canteen, day and menu, caches it and displays it
+    def set_menu(self, mensa: str, date: tuple[int, int, int], menu: list[str, str, int]):
+        menu_grid = self.build_menu_grid(menu)
+        self.menu_grids.put((mensa, date), menu_grid, self.repository.get_week(mensa))
+        self.show_menu_grid(menu_grid, (mensa, date))
+
+    @staticmethod
+    def build_menu_grid(menu: list[str, str, int]) -> MenuGrid:
+        menu_grid = MenuGrid(0, 0)
+        with span("init_menu_grid", rows=len(menu)):
+            init_menu_grid(menu_grid, menu)
+        return menu_grid
+
+    # Puts the given menu grid for the given canteen and date into body_grid
+    def show_menu_grid(self, menu_grid: MenuGrid, key: tuple[str, tuple[int, int, int]]):
+        self.body_grid.set_cell(1, 1, menu_grid)
+        self.menu_grid = menu_grid
+        self.menu_key = key
+        self.invalidate()
+
+    # Prefetches the canteens likely to be opened after the opened one
+    def prefetch(self):
+        index = self.mensa_tabs.get_opened_cell()[0]
+        self.prefetcher.set_targets(self.prefetcher.get_targets(self.tab_mensas(), index))
+
+    # Returns the canteens (raw names) of mensa_tabs in tab order
+    def tab_mensas(self) -> list[str]:
+        return [raw_mensa(self.mensa_tabs.get_cell(column, 0).get_text())
+                for column in range(len(self.mensa_tabs.columns))]
+
+    # Runs a blocking function in the thread pool without blocking the event loop
+    async def run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
@@ -0,0 +1,195 @@
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+from fakeTerminal import FakeTerminal
+from compactMenu import CompactMenu
+from ui import build_ui, screen, init_menu_grid
+
+
+# This file contains the rendering benchmark suite
+# The real widget tree (see build_ui in ui.py) is built against a FakeTerminal
+# and filled with canned menus, so neither a terminal nor a network connection is needed
+# Run "python benchmark.py --help" for the available options
+
+# Terminal sizes (width, height) the benchmarks are run with
+SIZES = [(80, 24), (120, 40), (200, 60), (300, 100)]
+
+# Numbers of rows of the canned menus
+MENU_LENGTHS = [5, 15, 40]
+
+# Days that fill day_tabs, in the (day, month, year) format
+DAYS = [(9, 12, 2024), (10, 12, 2024), (11, 12, 2024), (12, 12, 2024), (13, 12, 2024)]
+
+CATEGORIES = ["Tellergericht", "Vegetarisch", "Empfehlung des Tages", "Klassiker",
+              "Pasta", "Burger Classics", "Wok", "Ofenkartoffel", "Beilage"]
+
+DISHES = ["Currywurst mit Pommes frites",
+          "Hähnchenbrustfilet mit Kräuterrahmsauce, dazu Reis und Salat der Saison",
+          "Linsen-Dal",
+          "Schweineschnitzel Wiener Art mit Zitronenecke und hausgemachtem Kartoffelsalat",
+          "Gemüselasagne mit Tomatensauce",
+          "Rindergulasch",
+          "Vegane Bolognese mit Vollkornspaghetti und geriebenem Hartkäseersatz"]
+
+
+# Returns a deterministic menu with the given number of rows
+# in the same format as stw_parser.get_menu
+def canned_menu(rows: int) -> CompactMenu:
+    menu = []
+    for row in range(rows):
+        category = CATEGORIES[row % len(CATEGORIES)]
+        dish = DISHES[row * 3 % len(DISHES)]
+        price = 0 if category == "Beilage" else 150 + row * 35 % 400
+        menu.append([category, dish, price])
+    return CompactMenu(menu)
+
+
+# Builds the widget tree for the given terminal and menu
+# The cursor is moved into the menu, so the dish names scroll like in a real session
+def build(term: FakeTerminal, menu: list[str, str, int]):
+    main_grid = build_ui(term, DAYS)
+    init_menu_grid(main_grid.get_by_label("body").get_by_label("menu_grid"), menu)
+    for key in ["KEY_DOWN", "KEY_DOWN", "KEY_RIGHT"]:
+        main_grid.move_cursor(key)
+    main_grid.update()
+    return main_grid
+
+
+# Calls func repeatedly for at least the given duration (and at least 3 times)
+# Returns the mean time per call in seconds and the mean number of bytes
+# allocated per call (the latter is measured in a separate, shorter pass,
+# since tracemalloc slows down the code considerably)
+def measure(func, duration: float) -> tuple[float, float]:
+    calls = 0
+    start = time.perf_counter()
+    while calls < 3 or time.perf_counter() - start < duration:
+        func()
+        calls += 1
+    seconds = (time.perf_counter() - start) / calls
+
+    allocation_calls = max(1, min(calls, 10))
+    tracemalloc.start()
+    allocated = 0
+    for i in range(allocation_calls):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    return seconds, allocated / allocation_calls
+
+
+# Runs every benchmark for every terminal size and menu length
+# Returns a dict<str, dict> from the benchmark name to its results
+def run(sizes: list[tuple[int, int]], menu_lengths: list[int], duration: float) -> dict:
+    results = dict()
+    for width, height in sizes:
+        for rows in menu_lengths:
+            term = FakeTerminal(width, height)
+            menu = canned_menu(rows)
+            main_grid = build(term, menu)
+            body_grid = main_grid.get_by_label("body")
+            menu_grid = body_grid.get_by_label("menu_grid")
+            frame_bytes = len((term.home + screen(main_grid, term)).encode())
+
+            # The resize benchmark switches between the smallest size and the current one
+            resize_sizes = [(80, 24), (width, height)]
+
+            def resize():
+                term.set_size(*resize_sizes[0])
+                main_grid.set_size(term.width, term.height)
+                resize_sizes.reverse()
+
+            benchmarks = {
+                "screen": lambda: screen(main_grid, term),
+                "update": main_grid.update,
+                "get_event": body_grid.get_event,
+                "init_menu_grid": lambda: init_menu_grid(menu_grid, menu),
+                "resize": resize
+            }
+
+            for name, func in benchmarks.items():
+                seconds, allocated = measure(func, duration)
+                key = f"{name} {width}x{height} menu={rows}"
+                results[key] = {
+                    "seconds": seconds,
+                    "per_second": 1 / seconds if seconds > 0 else float("inf"),
+                    "allocated_bytes": allocated,
+                    "output_bytes": frame_bytes if name == "screen" else 0
+                }
+                report(key, results[key])
+
+                # The terminal size might have been changed by the resize benchmark
+                term.set_size(width, height)
+                main_grid.set_size(width, height)
+
+    return results
+
+
+# Prints one line of the results table
+def report(key: str, result: dict, baseline=None):
+    line = (f"{key:<36}"
+            f"{result['seconds'] * 1000:>10.3f} ms"
+            f"{result['per_second']:>10.1f}/s"
+            f"{result['allocated_bytes'] / 1024:>10.1f} KiB"
+            f"{result['output_bytes']:>10} B")
+    if baseline is not None:
+        line += f"{result['seconds'] / baseline['seconds']:>8.2f}x"
+    print(line)
+
+
+# Compares the results with a stored baseline and prints the comparison
+# Returns the list of benchmark names that are slower than the baseline
+# by more than the given tolerance (e.g. 0.1 for 10%)
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    print()
+    print("Comparison with the baseline (time relative to the baseline):")
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        report(key, result, baseline[key])
+        if result["seconds"] > baseline[key]["seconds"] * (1 + tolerance):
+            regressions.append(key)
+    return regressions
+
+
+# Parses a size in the "WIDTHxHEIGHT" format
+def parse_size(s: str) -> tuple[int, int]:
+    width, height = s.lower().split('x')
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rendering benchmarks for the Mensa TUI")
+    parser.add_argument("--size", type=parse_size, action="append",
+                        help="terminal size WIDTHxHEIGHT, may be repeated (default: 80x24 to 300x100)")
+    parser.add_argument("--rows", type=int, action="append",
+                        help="number of menu rows, may be repeated (default: 5, 15, 40)")
+    parser.add_argument("--duration", type=float, default=0.5,
+                        help="minimal duration of each benchmark in seconds")
+    parser.add_argument("--save", metavar="FILE",
+                        help="stores the results as a baseline in FILE")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="compares the results with the baseline stored in FILE")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="relative slowdown that counts as a regression")
+    arguments = parser.parse_args()
+
+    results = run(arguments.size or SIZES, arguments.rows or MENU_LENGTHS, arguments.duration)
+
+    if arguments.save:
+        with open(arguments.save, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            regressions = compare(results, json.load(file), arguments.tolerance)
+        if len(regressions) != 0:
+            print()
+            print("Regressions: " + ", ".join(regressions))
+            sys.exit(1)
@@ -0,0 +1,54 @@
+import sys
+from array import array
+
+
+# CompactMenu is the menu of one canteen on one day in a compact, column-wise form
+# It behaves like the list of [dish category, dish name, price in cents] rows it is built from
+# (len, indexing, iteration and comparison with lists), so it can be used wherever a menu is expected
+# Instead of a list per row, the categories and the dish names are stored in tuples
+# and the prices in an unsigned int array. The texts are interned, so a category like "Beilage"
+# or a dish served on several days or in several canteens is stored only once,
+# no matter how often it is downloaded
+# Attributes:
+# - self.categories - (str), the interned categories of the rows
+# - self.dishes - (str), the interned dish names of the rows
+# - self.prices - array<int>, the prices of the rows in cents
+class CompactMenu:
+    __slots__ = ("categories", "dishes", "prices")
+
+    def __init__(self, rows=()):
+        rows = list(rows)
+        self.categories = tuple(sys.intern(str(category)) for category, dish, price in rows)
+        self.dishes = tuple(sys.intern(str(dish)) for category, dish, price in rows)
+        self.prices = array('I', (int(price) for category, dish, price in rows))
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    # Returns the row with the given index as [category, dish, price] (a list of rows for a slice)
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[row] for row in range(*index.indices(len(self)))]
+        return [self.categories[index], self.dishes[index], self.prices[index]]
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield [self.categories[row], self.dishes[row], self.prices[row]]
+
+    # Compact menus are equal to each other and to lists with the same rows
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CompactMenu):
+            return (self.categories == other.categories and self.dishes == other.dishes
+                    and self.prices == other.prices)
+        if isinstance(other, (list, tuple)):
+            return self.to_rows() == [list(row) for row in other]
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"CompactMenu({self.to_rows()!r})"
+
+    # Returns the rows as a list of lists (e.g. for serializing the menu to JSON)
+    def to_rows(self) -> list[list[str, str, int]]:
+        return list(self)
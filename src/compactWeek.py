@@ -0,0 +1,62 @@
+import datetime
+from collections.abc import MutableMapping
+
+from compactMenu import CompactMenu
+
+
+# CompactWeek holds the menus of one canteen for several days (see stw_parser.get_week)
+# It is a mapping from (day, month, year) to CompactMenu like the dict it replaces,
+# but internally the dates are stored as small ints (the proleptic Gregorian ordinal,
+# see datetime.date.toordinal) instead of tuples, and every menu is stored as a CompactMenu
+# The days keep the order in which they were added
+# Attributes:
+# - self.menus - dict<int, CompactMenu>, the menus by the ordinal of their date
+class CompactWeek(MutableMapping):
+    __slots__ = ("menus",)
+
+    # days - mapping or iterable of ((day, month, year), menu) pairs
+    def __init__(self, days=()):
+        self.menus = dict()
+        self.update(days)
+
+    # Dates that aren't valid (day, month, year) tuples are never contained
+    def __getitem__(self, date: tuple[int, int, int]) -> CompactMenu:
+        try:
+            return self.menus[date_key(date)]
+        except (TypeError, ValueError):
+            raise KeyError(date)
+
+    # The menu is converted to a CompactMenu unless it already is one
+    def __setitem__(self, date: tuple[int, int, int], menu):
+        self.menus[date_key(date)] = menu if isinstance(menu, CompactMenu) else CompactMenu(menu)
+
+    def __delitem__(self, date: tuple[int, int, int]):
+        del self.menus[date_key(date)]
+
+    def __iter__(self):
+        for key in self.menus:
+            yield key_date(key)
+
+    def __len__(self) -> int:
+        return len(self.menus)
+
+    def __contains__(self, date) -> bool:
+        try:
+            return date_key(date) in self.menus
+        except (TypeError, ValueError):
+            return False
+
+    def __repr__(self) -> str:
+        return f"CompactWeek({dict(self.items())!r})"
+
+
+# Converts a (day, month, year) tuple to the key a date is stored under
+def date_key(date: tuple[int, int, int]) -> int:
+    day, month, year = date
+    return datetime.date(year, month, day).toordinal()
+
+
+# Converts a key created by date_key back to (day, month, year)
+def key_date(key: int) -> tuple[int, int, int]:
+    date = datetime.date.fromordinal(key)
+    return date.day, date.month, date.year
@@ -0,0 +1,77 @@
+from collections import deque
+from contextlib import nullcontext
+from blessed.keyboard import Keystroke
+
+
+# Escape sequences of the named keys the program reacts to
+# Other named keys are given a bare escape character
+KEY_SEQUENCES = {
+    "KEY_UP": "\x1b[A",
+    "KEY_DOWN": "\x1b[B",
+    "KEY_RIGHT": "\x1b[C",
+    "KEY_LEFT": "\x1b[D"
+}
+
+
+# FakeTerminal is a stand-in for blessed.Terminal that is used when the UI
+# is driven without a real terminal (e.g. in benchmark.py)
+# It implements only the part of the Terminal interface the widgets and main.py use
+# The color methods return the same truecolor escape sequences a real terminal would,
+# so the size of the rendered frames is realistic
+# Attributes:
+# - self.width - int, the width of the "window" in cells
+# - self.height - int, the height of the "window" in cells
+# - self.number_of_colors - int, the number of colors the terminal claims to support
+# - self.keys - deque<Keystroke>, the keys that are to be returned by self.inkey
+class FakeTerminal:
+    def __init__(self, width=80, height=24, keys=None, number_of_colors=1 << 24):
+        self.width = width
+        self.height = height
+        self.number_of_colors = number_of_colors
+        self.keys = deque()
+        self.home = "\x1b[H"
+        self.normal = "\x1b[m"
+        self.reverse = "\x1b[7m"
+        self.red = "\x1b[31m"
+        self.white = "\x1b[37m"
+        self.on_black = "\x1b[40m"
+        for key in keys or []:
+            self.push_key(key)
+
+    # Simulates the resizing of the terminal window
+    def set_size(self, width: int, height: int):
+        self.width = width
+        self.height = height
+
+    # Queues a key to be returned by self.inkey
+    # key is either a Keystroke or a str (either a key name like "KEY_DOWN" or a character)
+    def push_key(self, key):
+        if isinstance(key, Keystroke):
+            self.keys.append(key)
+        elif key.startswith("KEY_"):
+            self.keys.append(Keystroke(KEY_SEQUENCES.get(key, "\x1b"), name=key))
+        else:
+            self.keys.append(Keystroke(key))
+
+    # Returns the next queued key or an empty Keystroke if there are none
+    # The timeout is ignored, since waiting would only distort measurements
+    def inkey(self, timeout=None) -> Keystroke:
+        if len(self.keys) == 0:
+            return Keystroke()
+        return self.keys.popleft()
+
+    def color_rgb(self, red: int, green: int, blue: int) -> str:
+        return f"\x1b[38;2;{red};{green};{blue}m"
+
+    def on_color_rgb(self, red: int, green: int, blue: int) -> str:
+        return f"\x1b[48;2;{red};{green};{blue}m"
+
+    # The terminal modes have no effect on a fake terminal
+    def cbreak(self):
+        return nullcontext()
+
+    def hidden_cursor(self):
+        return nullcontext()
+
+    def fullscreen(self):
+        return nullcontext()
@@ -0,0 +1,92 @@
+import os
+import re
+import select
+
+from blessed import Terminal
+
+
+# FrameWriter writes whole frames to the terminal with as few system calls as possible
+# Every frame is encoded and written with os.write, bypassing the buffering of sys.stdout
+# (which may split a frame into many writes)
+# Partial writes (e.g. when the terminal is slow to read) are continued until the frame is complete
+# If self.synchronized is set, the frame is wrapped in the synchronized output sequences,
+# so that the terminal displays it at once instead of showing half-drawn frames
+# (see supports_synchronized_output). The sequences and the frame are written together with
+# os.writev, so the frame isn't copied; where it is missing (e.g. on Windows), they are written one by one
+# Streams without a file descriptor (e.g. io.StringIO) are written to directly
+# Attributes:
+# - self.stream - the text stream the terminal is written to (usually sys.stdout)
+# - self.fd - int, the file descriptor of the stream (None if it has none)
+# - self.synchronized - bool
+# - self.writes - int, the number of system calls needed for the last frame
+class FrameWriter:
+    BEGIN_SYNCHRONIZED = b"\x1b[?2026h"
+    END_SYNCHRONIZED = b"\x1b[?2026l"
+
+    def __init__(self, stream, synchronized=True):
+        self.stream = stream
+        try:
+            self.fd = stream.fileno()
+        except (AttributeError, OSError, ValueError):  # io.UnsupportedOperation is an OSError
+            self.fd = None
+        self.synchronized = synchronized
+        self.writes = 0
+
+    # Writes a frame and returns its size in bytes (without the synchronized output sequences)
+    # data is the encoded frame if it was already encoded (e.g. to measure its size), None otherwise
+    def write(self, frame: str, data=None) -> int:
+        if data is None:
+            data = frame.encode()
+        if self.fd is None:
+            self.stream.write(frame)
+            self.stream.flush()
+            self.writes = 1
+            return len(data)
+
+        # Text written to the stream before (e.g. by blessed) has to reach the terminal first
+        self.stream.flush()
+        if self.synchronized:
+            self.write_all([self.BEGIN_SYNCHRONIZED, data, self.END_SYNCHRONIZED])
+        else:
+            self.write_all([data])
+        return len(data)
+
+    # Writes all of the given byte strings in order, continuing after partial writes
+    def write_all(self, parts: list[bytes]):
+        self.writes = 0
+        parts = [memoryview(part) for part in parts if len(part) != 0]
+        while len(parts) != 0:
+            try:
+                if hasattr(os, "writev"):
+                    written = os.writev(self.fd, parts)
+                else:
+                    written = os.write(self.fd, parts[0])
+                self.writes += 1
+            except BlockingIOError:
+                # The terminal is not reading fast enough, waits until it can take more
+                select.select([], [self.fd], [])
+                continue
+
+            # Drops the written parts and the written beginning of a partially written one
+            while len(parts) != 0 and written >= len(parts[0]):
+                written -= len(parts[0])
+                parts.pop(0)
+            if len(parts) != 0:
+                parts[0] = parts[0][written:]
+
+
+# The answer to the query of supports_synchronized_output: the DECRQM report of mode 2026 (if the terminal
+# knows DECRQM), followed by the answer to the primary device attributes query (DA1)
+SYNCHRONIZED_OUTPUT_REPORT = re.compile(r"(?:\x1b\[\?2026;([0-9]+)\$y)?[^\x1b]*\x1b\[\?[0-9;]*c")
+
+
+# Asks the terminal if it supports synchronized output (DECRQM for mode 2026)
+# Terminals that don't know DECRQM don't answer it, so the primary device attributes are requested
+# after it: every terminal answers that, so the answer doesn't have to be waited for until the timeout
+# Returns False if the terminal doesn't answer within timeout seconds (or isn't a terminal at all)
+def supports_synchronized_output(term: Terminal, timeout=0.5) -> bool:
+    if not getattr(term, "is_a_tty", False):
+        return False
+    match = term._query_response("\x1b[?2026$p\x1b[c", SYNCHRONIZED_OUTPUT_REPORT, timeout)
+    # 1 and 2 (set and reset) mean the mode is supported, 0 that it isn't known, 4 that it can't be set
+    return match is not None and match.group(1) in ("1", "2")
@@ -89,6 +89,42 @@ class Grid(Widget):
         self.columns[index] = (size, unit)
         self.update_pref_widths()
 
+    # Inserts a new row with the given height before the row with the given index
+    # (or after the last row if the index equals the number of rows)
+    # The new cells contain dummy widgets, the selected cell and the labels keep their widgets
+    def insert_row(self, index: int, size: int, unit: Unit):
+        if index < 0 or index > len(self.rows):
+            return
+        self.rows.insert(index, (size, unit))
+        self.widget_grid.insert(index, [Widget(0, 0) for column in range(len(self.columns))])
+        self.labels = {label: (x, y + 1 if y >= index else y) for label, (x, y) in self.labels.items()}
+
+        active_x, active_y = self.active_cell
+        if active_y >= index:
+            self.active_cell = (active_x, active_y + 1)
+        self.set_size(self.width, self.height)
+
+    # Removes the row with the given index, unless it is the only one
+    # The labels of its cells are removed. If it contained the selected cell,
+    # the cell below it (or above it, if it was the last row) is selected instead
+    def remove_row(self, index: int):
+        if index < 0 or index >= len(self.rows) or len(self.rows) == 1:
+            return
+        self.rows.pop(index)
+        self.widget_grid.pop(index)
+        self.labels = {label: (x, y - 1 if y > index else y) for label, (x, y) in self.labels.items()
+                       if y != index}
+
+        active_x, active_y = self.active_cell
+        if active_y > index:
+            self.active_cell = (active_x, active_y - 1)
+        elif active_y == index:
+            # The removed widget can't be deactivated anymore, so the new one is just activated
+            self.active_cell = (active_x, min(active_y, len(self.rows) - 1))
+            if self.active:
+                self.get_cell(*self.active_cell).set_active(True)
+        self.set_size(self.width, self.height)
+
     # Sets new parameter values for given parameter keys
     # Depending on the value of propagate, also sets the parameters for its child widgets
     # Note: values of the keys not mentioned in the parameters dict
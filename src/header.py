@@ -14,7 +14,7 @@ class Header(TextLine):
         self.parameters["accent"] = (0, 0, 255)
 
     def get_char(self, x: int, y: int, term: Terminal) -> str:
-        gradient_width = max(0, (self.width - len(self.text)) // 2)
+        gradient_width = max(0, (self.width - self.layout.width) // 2)
         vertical_center = (self.height - 1) // 2
 
         if gradient_width <= x < self.width - gradient_width:
@@ -24,7 +24,7 @@ class Header(TextLine):
             else:
                 out = (term.color_rgb(*self.parameters["inactive_text"]) +
                        term.on_color_rgb(*self.parameters["inactive_background"]))
-            out += (self.get_text_char(x - gradient_width)
+            out += (self.layout.line(self.width - 2 * gradient_width)[x - gradient_width]
                     if y == vertical_center
                     else ' ')
             return out
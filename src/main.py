@@ -1,18 +1,17 @@
+import os
 import sys
+import argparse
 
 from blessed import Terminal
-from widget import Widget
-from grid import Grid
-from menuGrid import MenuGrid
-from verticalTabs import VerticalTabs
-from horizontalTabs import HorizontalTabs
-from textLine import TextLine
-from header import Header
-from enums import Unit, Event
-from stw_parser import (get_menu, formatted_date, raw_date,
-                        get_available_days, raw_mensa, FORMATTED_TO_RAW_MENSA)
-
-ARROW_KEYS = {"KEY_LEFT", "KEY_RIGHT", "KEY_UP", "KEY_DOWN"}
+from application import Application
+from outputProfile import OutputProfile
+from frameWriter import FrameWriter, supports_synchronized_output
+from parsePool import ParsePool
+from sessionRecorder import SessionRecorder
+from menuArchive import MenuArchive
+from ui import build_ui
+import tracing
+from stw_parser import get_menu, get_available_days, set_shared_cache, set_parse_pool, add_week_listener
 
 # Conventions used:
 # - snake_case for variables, functions and methods
@@ -33,72 +32,36 @@ ARROW_KEYS = {"KEY_LEFT", "KEY_RIGHT", "KEY_UP", "KEY_DOWN"}
 
 
 # The main function
-# Contains the initialisation of the TUI and the event loop
+# Contains the initialisation of the TUI, the event loop
 # with things like keyboard and internal event handling and screen update
-def main(term: Terminal) -> int:
+# is run by Application (see application.py)
+# The terminal is wrapped in an OutputProfile with the given profile (detected if None)
+# and frame budget in bytes (0 if unlimited), see outputProfile.py
+# Frames are wrapped in synchronized output sequences if synchronized is set
+# and the terminal supports them, see frameWriter.py
+# Menus older than max_staleness seconds are downloaded before being displayed,
+# and show_age decides if the footer shows their age, see menuRepository.py
+def main(term: Terminal, profile=None, frame_budget=0, synchronized=True,
+         max_staleness=6 * 60 * 60, show_age=True) -> int:
+    term = OutputProfile(term, profile, frame_budget)
+
     # Sets the terminal mode before initialisation
     with (term.cbreak(), term.hidden_cursor(), term.fullscreen()):
-        # Initialises main_grid, fills the cells with needed widgets
-        # The header and the footer are initialised in-place
-        main_grid = Grid(term.width, term.height)
-        main_grid.set_grid([(1, Unit.CELLS), (100, Unit.PERCENTS), (1, Unit.CELLS)],
-                           [(100, Unit.PERCENTS)])
-        main_grid.set_active(True)
-        main_grid.set_cell(0, 0, Header(0, 0, "Speisepläne - STW Aachen"))
-        main_grid.set_cell(0, 1, Grid(0, 0))
-        main_grid.set_cell(0, 2, Header(0, 0, "Press Q to quit"))
-
-        # Initialises body_grid
-        body_grid = main_grid.get_cell(0, 1)
-        body_grid.set_grid([(2, Unit.CELLS), (100, Unit.PERCENTS)],
-                           [(11, Unit.CELLS), (100, Unit.PERCENTS)])
-        body_grid.set_cell(0, 1, VerticalTabs(0, 0))
-        body_grid.set_cell(1, 0, HorizontalTabs(0, 0))
-        body_grid.set_cell(1, 1, MenuGrid(0, 0))
-
-        if len(get_available_days()) == 0:
+        days = get_available_days()
+        if len(days) == 0:
             print(term.red + term.on_black + "ERROR: No available days")
             print(term.white + term.on_black + "Press any key to quit")
             key = term.inkey()
             return
 
-        # Fills day_tabs with days for which the menus can be fetched from the STW website
-        day_tabs = body_grid.get_cell(0, 1)
-        day_tabs.set_tabs([formatted_date(*date) for date in get_available_days()])
-
-        # Fills mensa_tabs with a fixed set of canteens for which the menus can be fetched
-        mensa_tabs = body_grid.get_cell(1, 0)
-        mensa_tabs.set_tabs(list(FORMATTED_TO_RAW_MENSA))
-
-        # Sets the appearance for body_grid and its child widgets
-        body_grid.set_parameters({
-            "active_background": (0, 0, 255),
-            "inactive_background": (96, 96, 96),
-            "opened_background": (255, 255, 255),
-            "active_text": (255, 255, 255),
-            "inactive_text": (255, 255, 255),
-            "opened_text": (0, 0, 0)
-        })
-        day_tabs.set_parameter("active_background", (96, 96, 96), propagate=False)
-        mensa_tabs.set_parameter("active_background", (96, 96, 96), propagate=False)
-
-        # Setting different background colors for odd and even rows makes them more legible
-        for row in range(len(day_tabs.rows)):
-            day_tabs.get_cell(0, row).set_parameter(
-                "inactive_background", (128, 128, 128) if row % 2 == 0 else (96, 96, 96)
-            )
-
-        menu_grid = body_grid.get_cell(1, 1)
+        writer = FrameWriter(sys.stdout, synchronized and supports_synchronized_output(term))
+        # Builds the widget tree, see build_ui
+        application = Application(term, build_ui(term, days), writer,
+                                  max_staleness=max_staleness, show_age=show_age)
 
         # Fetches the menu before the event loop
-        menu = get_menu(
-            raw_mensa(
-                mensa_tabs.get_cell(*mensa_tabs.get_opened_cell()).get_text(),
-            ),
-            *raw_date(
-                day_tabs.get_cell(*day_tabs.get_opened_cell()).get_text()
-            )
-        )
+        mensa, date = application.get_selection()
+        menu = get_menu(mensa, *date)
 
         if len(menu) == 0:
             print(term.red + term.on_black + "ERROR: Empty menu")
@@ -106,99 +69,71 @@ def main(term: Terminal) -> int:
             key = term.inkey()
             return
 
-        # Redraws menu_grid with the new data
-        init_menu_grid(menu_grid, menu)
-
-        # The main loop
-        while True:
-            # Handles the keyboard presses
-            key = term.inkey(timeout=0.05)
-            if key == 'q':
-                break
-            elif key.name in ARROW_KEYS:
-                main_grid.move_cursor(key.name)
-
-            # Updates body_grid (needed for scrolling the menu text, menu_grid and the tabs)
-            body_grid.update()
-
-            # VALUE_CHANGED forwarded by body_grid signalises that
-            # either a different day or a different canteen was selected
-            # (only the tabs utilise event handling)
-            if body_grid.get_event() == Event.VALUE_CHANGED:
-                # Fetches the data for the new day and/or canteen
-                menu = get_menu(
-                    raw_mensa(
-                        mensa_tabs.get_cell(*mensa_tabs.get_opened_cell()).get_text(),
-                    ),
-                    *raw_date(
-                        day_tabs.get_cell(*day_tabs.get_opened_cell()).get_text()
-                    )
-                )
-
-                # Redraws menu_grid with the new data
-                init_menu_grid(menu_grid, menu)
-
-            # Resizes the UI based on the new size of the window
-            if ((term.width, term.height) != main_grid.get_size()):
-                main_grid.set_size(term.width, term.height)
-            # Renders the screen and prints it in the terminal,
-            # beginning from the top-right position ("home")
-            print(term.home + screen(main_grid, term), end='')
-            # Clears the buffer
-            sys.stdout.flush()
-
-    return 0
-
-
-# Determines what should be displayed in each sell of the terminal screen
-# Returns the whole frame
-def screen(window: Widget, term: Terminal) -> str:
-    out = ''
-    for y in range(term.height):
-        for x in range(term.width):
-            out += window.get_char(x, y, term)
-        out += '\n'
-    return out[:-1]
-
-
-# Fills menu_grid with the given data (usually called after a new day or canteen was selected)
-def init_menu_grid(menu_grid: MenuGrid, menu: list[str, str, int]):
-    # Determines and sets column widths and row heights
-    max_category_width = max([len(category) for category, dish, price in menu])
-    menu_grid.set_grid(
-        [(3, Unit.CELLS)] * len(menu),
-        [(max_category_width + 1, Unit.CELLS), (100, Unit.PERCENTS), (6, Unit.CELLS)]
-    )
-
-    # Fills the table with the given data
-    # Since prices are given in cents, they are first formatted before being displayed
-    for row in range(len(menu)):
-        category, dish, price = menu[row]
-        f_price = (f"{'-' if price == 0 else price // 100}"
-                   ","
-                   f"{'-' if price == 0 else price // 10 % 10}"
-                   f"{'-' if price == 0 else price % 10} €")
-        menu_grid.set_cell(0, row, TextLine(0, 0, category))
-        menu_grid.set_cell(1, row, TextLine(0, 0, dish))
-        menu_grid.set_cell(2, row, TextLine(0, 0, f_price))
-
-    # Appearance parameters are set for menu_grid
-    menu_grid.set_parameters({
-        "active_background": (0, 0, 255),
-        "inactive_background": (255, 255, 255),
-        "active_text": (255, 255, 255),
-        "inactive_text": (0, 0, 0)
-    })
-    menu_grid.set_parameter("active_background", (255, 255, 255), propagate=False)
-
-    # Setting different background colors for odd and even rows makes them more legible
-    for row in range(len(menu)):
-        for column in range(3):
-            menu_grid.get_cell(column, row).set_parameter(
-                "inactive_background", (255, 255, 255) if row % 2 == 0 else (224, 224, 224)
-            )
+        # Displays the menu in menu_grid
+        application.set_menu(mensa, date, menu)
+
+        return application.run()
+
+
+# Parses the command line arguments of the program
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Menus of the STW Aachen canteens")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="records a trace of the main phases of the program and writes it "
+                             "to FILE on exit (Chrome trace format, same as MENSA_TRACE=FILE); "
+                             f"only the last {tracing.MAX_EVENTS} spans are kept")
+    parser.add_argument("--colors", choices=OutputProfile.PROFILES,
+                        help="the colors used for the output (detected from the terminal by default), "
+                             "fewer colors need less bandwidth, e.g. over slow SSH connections")
+    parser.add_argument("--frame-budget", metavar="BYTES", type=int, default=0,
+                        help="the maximal size of a frame, fewer colors are used "
+                             "while frames are larger (unlimited by default)")
+    parser.add_argument("--no-sync", action="store_true",
+                        help="doesn't use synchronized output, even if the terminal reports to support it")
+    parser.add_argument("--record", metavar="FILE",
+                        help="records the session (keys, resizes and menus) and writes it to FILE on exit, "
+                             "see sessionReplayer.py")
+    parser.add_argument("--shared-cache", metavar="FILE", default=os.environ.get("MENSA_SHARED_CACHE"),
+                        help="shares the downloaded menus with all instances using the same FILE "
+                             "(an SQLite database, same as MENSA_SHARED_CACHE=FILE)")
+    parser.add_argument("--max-staleness", metavar="MINUTES", type=float, default=6 * 60,
+                        help="outdated menus are displayed while being refreshed in the background, "
+                             "unless they are older than MINUTES (default: 360)")
+    parser.add_argument("--hide-age", action="store_true",
+                        help="doesn't show how long ago the displayed menu was downloaded")
+    parser.add_argument("--archive", metavar="FILE", default=MenuArchive.DEFAULT_PATH,
+                        help="adds every downloaded menu to the history in FILE, see menuArchive.py "
+                             f"(default: {MenuArchive.DEFAULT_PATH})")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="doesn't keep a history of the downloaded menus")
+    parser.add_argument("--parse-workers", metavar="N", type=int, default=0,
+                        help="parses the pages downloaded in the background (the weeks of all canteens "
+                             "for the prefetching, the week view and the search) in N worker processes, "
+                             "see parsePool.py (default: 0, they are parsed in this process)")
+    return parser.parse_args()
 
 
 # Calls the main function with a new terminal window when the program is launched
 if __name__ == "__main__":
-    exit(main(Terminal()))
+    arguments = parse_arguments()
+    # The workers are started first, before this process starts any threads
+    pool = ParsePool(arguments.parse_workers) if arguments.parse_workers > 0 else None
+    set_parse_pool(pool)
+    if arguments.trace:
+        tracing.enable(arguments.trace)
+    if arguments.shared_cache:
+        set_shared_cache(arguments.shared_cache)
+    if not arguments.no_archive:
+        add_week_listener(MenuArchive(arguments.archive).enqueue_week)
+    term = Terminal()
+    if arguments.record:
+        term = SessionRecorder(term)
+    try:
+        code = main(term, arguments.colors, arguments.frame_budget, not arguments.no_sync,
+                    arguments.max_staleness * 60, not arguments.hide_age)
+    finally:
+        if arguments.record:
+            term.save(arguments.record)
+        if pool is not None:
+            pool.shutdown()
+    exit(code)
@@ -0,0 +1,389 @@
+import os
+import sys
+import zlib
+import struct
+import argparse
+import datetime
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from compactMenu import CompactMenu
+from compactWeek import date_key, key_date
+from searchIndex import matches
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:  # Only available on Windows
+    msvcrt = None
+
+
+# The first bytes of an archive file
+MAGIC = b"MENSA-ARCHIVE-1\n"
+
+# The header of a segment: archive time (Unix time), bytes of the string table, number of days, number of rows
+SEGMENT_HEADER = struct.Struct("<dIII")
+
+# The length of a compressed segment, written in front of it
+SEGMENT_LENGTH = struct.Struct("<I")
+
+# The position of the byte locked on Windows while the file is written (see lock_file),
+# far behind the data, since Windows doesn't let other processes read locked bytes
+LOCK_OFFSET = 1 << 40
+
+
+# MenuArchive is a local history of the menus of all canteens
+# Every downloaded week is appended to a file (see add_week), so the archive grows over the semesters,
+# while stw_parser only knows the current week. Days that didn't change since they were archived
+# are skipped, so downloading the same week again doesn't grow the file
+# File format: MAGIC followed by segments, each one the zlib-compressed days of one canteen
+# that were added at once, stored column by column (see encode_segment)
+# Several processes (e.g. two TUIs of the same user) may add to the same file: appends happen
+# under an exclusive lock of the file, after reading the segments the others appended meanwhile
+# A segment that can't be decoded is skipped, a segment that was cut off at the end of the file
+# (e.g. by a crash while writing) is removed before the next append
+# The TUI adds the downloaded weeks in a background thread (see enqueue_week), so downloads
+# don't wait for the file
+# For queries, the latest version of every day is kept in memory as columns of ints
+# sorted by date: categories and dish names are replaced by codes into a string table,
+# so a filter on the texts is evaluated once per distinct text and not once per row,
+# and a date range is found by binary search
+# Attributes:
+# - self.path - str, the path of the archive file
+# - self.days - dict<(str, int), CompactMenu>, the latest menu of every (canteen, date ordinal)
+# - self.loaded - bool, True after the file was read
+# - self.size - int, the number of valid bytes in the file
+# - self.foreign - bool, True if the file exists but isn't an archive (it is never written then)
+# - self.columns - dict<str, array>, the query columns (None if they have to be rebuilt),
+# - - see build_columns
+# - self.strings - [str], the texts the codes in the columns refer to
+# - self.lock - threading.Lock, weeks are added from the thread pool
+# - self.writer - ThreadPoolExecutor, the thread adding the weeks passed to enqueue_week
+class MenuArchive:
+    # The default location of the archive
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".mensa", "archive.bin")
+
+    def __init__(self, path=None):
+        self.path = path or self.DEFAULT_PATH
+        self.days = dict()
+        self.loaded = False
+        self.size = 0
+        self.foreign = False
+        self.columns = None
+        self.strings = []
+        self.lock = threading.Lock()
+        self.writer = ThreadPoolExecutor(max_workers=1)
+
+    # Reads the archive file, a missing file is treated as empty
+    def load(self):
+        self.loaded = True
+        try:
+            with open(self.path, "rb") as file:
+                self.read(file)
+        except OSError:
+            return
+
+    # Reads the segments behind the first self.size bytes of the open file,
+    # i.e. the whole file at first and later the segments appended by other processes
+    # Reading stops at an incomplete segment, self.size is the length of the part read
+    # Returns True if the file ends with an incomplete segment (or header)
+    def read(self, file) -> bool:
+        # The file was replaced by a shorter one, so it is read again
+        if file.seek(0, os.SEEK_END) < self.size:
+            self.size = 0
+            self.days = dict()
+        file.seek(self.size)
+        data = file.read()
+
+        offset = 0
+        if self.size == 0:
+            if not data.startswith(MAGIC):
+                # A file cut off while its header was written is overwritten
+                self.foreign = not MAGIC.startswith(data)
+                return len(data) != 0 and not self.foreign
+            offset = len(MAGIC)
+        while offset + SEGMENT_LENGTH.size <= len(data):
+            length, = SEGMENT_LENGTH.unpack_from(data, offset)
+            start = offset + SEGMENT_LENGTH.size
+            if start + length > len(data):
+                break
+            try:
+                mensa, archived, days = decode_segment(zlib.decompress(data[start:start + length]))
+            except (zlib.error, struct.error, ValueError, IndexError, UnicodeDecodeError):
+                days = []
+            for ordinal, menu in days:
+                self.days[(mensa, ordinal)] = menu
+            offset = start + length
+        self.size += offset
+        self.columns = None
+        return offset != len(data)
+
+    # Adds the given week in the background thread (see add_week), used as a week listener
+    # (see stw_parser.add_week_listener), so the file isn't written while a download holds its lock
+    # The weeks are added in the order they were passed
+    def enqueue_week(self, mensa: str, week: dict[tuple[int, int, int], list[str, str, int]]):
+        self.writer.submit(self.add_week, mensa, week)
+
+    # Adds the days of the given week (see stw_parser.get_week) of the given canteen
+    # that aren't archived yet or changed since they were archived
+    # Returns the number of added days, failures to write the file are ignored
+    def add_week(self, mensa: str, week: dict[tuple[int, int, int], list[str, str, int]]) -> int:
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            if len(self.changed_days(mensa, week)) == 0 or self.foreign:
+                return 0
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, "a+b") as file:
+                    lock_file(file)
+                    try:
+                        return self.append(file, mensa, week)
+                    finally:
+                        unlock_file(file)
+            except OSError:
+                return 0
+
+    # Returns the days of the given week that aren't archived yet or changed as [(date ordinal, CompactMenu)]
+    def changed_days(self, mensa: str, week: dict[tuple[int, int, int], list[str, str, int]]) -> list[tuple[int, CompactMenu]]:
+        days = []
+        for date, menu in week.items():
+            menu = menu if isinstance(menu, CompactMenu) else CompactMenu(menu)
+            if self.days.get((mensa, date_key(date))) != menu:
+                days.append((date_key(date), menu))
+        return days
+
+    # Appends the changed days of the given week to the open and locked file as a segment
+    # The segments appended by other processes are read first, so their days aren't added again
+    # Returns the number of added days
+    def append(self, file, mensa: str, week: dict[tuple[int, int, int], list[str, str, int]]) -> int:
+        torn = self.read(file)
+        days = self.changed_days(mensa, week)
+        if len(days) == 0 or self.foreign:
+            return 0
+
+        # Nobody else writes while the file is locked, so an incomplete segment at its end was cut off
+        if torn:
+            file.truncate(self.size)
+        if self.size == 0:
+            file.write(MAGIC)
+            self.size = len(MAGIC)
+        compressed = zlib.compress(encode_segment(mensa, datetime.datetime.now().timestamp(), days))
+        file.write(SEGMENT_LENGTH.pack(len(compressed)) + compressed)
+        file.flush()
+        self.size += SEGMENT_LENGTH.size + len(compressed)
+        for ordinal, menu in days:
+            self.days[(mensa, ordinal)] = menu
+        self.columns = None
+        return len(days)
+
+    # Builds the query columns from self.days, one entry per archived row, sorted by date and canteen:
+    # "date" (date ordinal), "mensa", "category" and "dish" (codes into self.strings) and "price"
+    def build_columns(self):
+        codes = dict()
+        self.strings = []
+
+        def code(text: str) -> int:
+            if text not in codes:
+                codes[text] = len(self.strings)
+                self.strings.append(text)
+            return codes[text]
+
+        columns = {name: array('I') for name in ("date", "mensa", "category", "dish", "price")}
+        for (mensa, ordinal), menu in sorted(self.days.items(), key=lambda item: (item[0][1], item[0][0])):
+            mensa_code = code(mensa)
+            columns["date"].extend([ordinal] * len(menu))
+            columns["mensa"].extend([mensa_code] * len(menu))
+            columns["category"].extend(code(category) for category in menu.categories)
+            columns["dish"].extend(code(dish) for dish in menu.dishes)
+            columns["price"].extend(menu.prices)
+        self.columns = columns
+
+    # Returns the query columns, reading the file and building them if needed
+    def get_columns(self) -> dict[str, array]:
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            if self.columns is None:
+                self.build_columns()
+            return self.columns
+
+    # Returns the indices of the rows between start and end (inclusive, (day, month, year) or None
+    # for no limit) of the given canteens (raw names, None for all) whose category and dish name
+    # are accepted by the given functions (called once per distinct text, None accepts all)
+    def select(self, mensas=None, start=None, end=None, category=None, dish=None) -> list[int]:
+        columns = self.get_columns()
+        dates = columns["date"]
+        first = 0 if start is None else bisect_left(dates, date_key(start))
+        last = len(dates) if end is None else bisect_right(dates, date_key(end))
+
+        filters = []
+        if mensas is not None:
+            filters.append((columns["mensa"], self.matching_codes(lambda text: text in mensas)))
+        if category is not None:
+            filters.append((columns["category"], self.matching_codes(category)))
+        if dish is not None:
+            filters.append((columns["dish"], self.matching_codes(dish)))
+
+        rows = range(first, last)
+        for column, accepted in filters:
+            rows = [row for row in rows if column[row] in accepted]
+        return list(rows)
+
+    # Returns the codes of the strings accepted by the given function
+    def matching_codes(self, accept) -> set[int]:
+        return {code for code, text in enumerate(self.strings) if accept(text)}
+
+    # Returns the price of every archived dish of the given category in the given canteen
+    # between start and end (see select) as [((day, month, year), price in cents)], ordered by date
+    # Side dishes without a price are left out
+    def price_history(self, mensa: str, category: str, start=None, end=None) -> list[tuple[tuple[int, int, int], int]]:
+        columns = self.get_columns()
+        rows = self.select([mensa], start, end, category=lambda text: text == category)
+        return [(key_date(columns["date"][row]), columns["price"][row]) for row in rows if columns["price"][row] != 0]
+
+    # Returns the number of priced dishes matching the filters (see select and searchIndex.matches)
+    # and their minimal, maximal and mean price in cents (None if there are none)
+    def price_stats(self, mensas=None, start=None, end=None, category=None, dish=None):
+        columns = self.get_columns()
+        rows = self.select(mensas, start, end,
+                           None if category is None else (lambda text: text == category),
+                           None if dish is None else matches(dish))
+        prices = [price for price in (columns["price"][row] for row in rows) if price != 0]
+        if len(prices) == 0:
+            return None
+        return {"count": len(prices), "min": min(prices), "max": max(prices), "mean": sum(prices) / len(prices)}
+
+    # Returns how many days each dish matching the query (see searchIndex.matches) was served
+    # in the given canteens between start and end (see select), the most frequent first
+    # Output format: [(dish name, number of days)]
+    def dish_frequency(self, query: str, mensas=None, start=None, end=None) -> list[tuple[str, int]]:
+        columns = self.get_columns()
+        rows = self.select(mensas, start, end, dish=matches(query))
+        served = {(columns["mensa"][row], columns["date"][row], columns["dish"][row]) for row in rows}
+        counts = Counter(self.strings[dish] for mensa, date, dish in served)
+        return counts.most_common()
+
+
+# Locks the given file exclusively, waits while another process holds the lock
+def lock_file(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        file.seek(LOCK_OFFSET)
+        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def unlock_file(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        file.seek(LOCK_OFFSET)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Encodes the days of one canteen as a segment: SEGMENT_HEADER, the string table
+# (the canteen, categories and dish names, separated by NUL characters) and the columns
+# of the days (date ordinal, number of rows) and of the rows (category and dish as indices
+# into the string table, price), each an array of little-endian unsigned ints
+def encode_segment(mensa: str, archived: float, days: list[tuple[int, CompactMenu]]) -> bytes:
+    strings = {mensa: 0}
+    columns = [array('I') for i in range(5)]
+    day_dates, day_rows, categories, dishes, prices = columns
+    for ordinal, menu in days:
+        day_dates.append(ordinal)
+        day_rows.append(len(menu))
+        categories.extend(strings.setdefault(category, len(strings)) for category in menu.categories)
+        dishes.extend(strings.setdefault(dish, len(strings)) for dish in menu.dishes)
+        prices.extend(menu.prices)
+
+    table = '\0'.join(strings).encode()
+    if sys.byteorder == "big":
+        for column in columns:
+            column.byteswap()
+    return (SEGMENT_HEADER.pack(archived, len(table), len(days), len(prices)) + table
+            + b''.join(column.tobytes() for column in columns))
+
+
+# Decodes a segment encoded by encode_segment
+# Returns the canteen, the archive time and the days as [(date ordinal, CompactMenu)]
+def decode_segment(data: bytes) -> tuple[str, float, list[tuple[int, CompactMenu]]]:
+    archived, table_length, day_count, row_count = SEGMENT_HEADER.unpack_from(data)
+    offset = SEGMENT_HEADER.size
+    strings = data[offset:offset + table_length].decode().split('\0')
+    offset += table_length
+
+    columns = []
+    for count in (day_count, day_count, row_count, row_count, row_count):
+        column = array('I')
+        column.frombytes(data[offset:offset + count * column.itemsize])
+        if len(column) != count:
+            raise ValueError("The segment is incomplete")
+        if sys.byteorder == "big":
+            column.byteswap()
+        columns.append(column)
+        offset += count * column.itemsize
+    day_dates, day_rows, categories, dishes, prices = columns
+
+    days = []
+    row = 0
+    for ordinal, rows in zip(day_dates, day_rows):
+        days.append((ordinal, CompactMenu(zip((strings[i] for i in categories[row:row + rows]),
+                                              (strings[i] for i in dishes[row:row + rows]),
+                                              prices[row:row + rows]))))
+        row += rows
+    return strings[0], archived, days
+
+
+# Parses a date given as DD.MM.YYYY
+def parse_date(text: str) -> tuple[int, int, int]:
+    try:
+        day, month, year = (int(i) for i in text.split('.'))
+        datetime.date(year, month, day)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date: {text} (expected DD.MM.YYYY)")
+    return day, month, year
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queries the menu history archived by the Mensa TUI")
+    parser.add_argument("--archive", metavar="FILE", default=MenuArchive.DEFAULT_PATH,
+                        help=f"the archive file (default: {MenuArchive.DEFAULT_PATH})")
+    parser.add_argument("--mensa", metavar="CANTEEN", action="append",
+                        help="raw canteen name (e.g. academica), may be repeated (default: all)")
+    parser.add_argument("--from", dest="start", metavar="DD.MM.YYYY", type=parse_date,
+                        help="first day of the queried period")
+    parser.add_argument("--to", dest="end", metavar="DD.MM.YYYY", type=parse_date,
+                        help="last day of the queried period")
+    commands = parser.add_subparsers(dest="command", required=True)
+    history = commands.add_parser("prices", help="prices of a category in one canteen, day by day")
+    history.add_argument("category", help="dish category, e.g. Tellergericht")
+    stats = commands.add_parser("stats", help="price statistics of the dishes matching a query")
+    stats.add_argument("query", nargs='?', help="words contained in the dish names (default: all dishes)")
+    stats.add_argument("--category", help="only dishes of this category")
+    frequency = commands.add_parser("frequency", help="how many days each dish matching a query was served")
+    frequency.add_argument("query", help="words contained in the dish names")
+    arguments = parser.parse_args()
+
+    archive = MenuArchive(arguments.archive)
+    if arguments.command == "prices":
+        for mensa in arguments.mensa or ["academica"]:
+            for date, price in archive.price_history(mensa, arguments.category, arguments.start, arguments.end):
+                print(f"{'.'.join(f'{i:02}' for i in date)}  {mensa:<16}{price / 100:>8.2f} €")
+    elif arguments.command == "stats":
+        result = archive.price_stats(arguments.mensa, arguments.start, arguments.end,
+                                     arguments.category, arguments.query)
+        if result is None:
+            print("No matching dishes")
+        else:
+            print(f"{result['count']} dishes, min {result['min'] / 100:.2f} €, max {result['max'] / 100:.2f} €, "
+                  f"mean {result['mean'] / 100:.2f} €")
+    else:
+        for dish, days in archive.dish_frequency(arguments.query, arguments.mensa, arguments.start, arguments.end):
+            print(f"{days:>5}  {dish}")
@@ -1,3 +1,6 @@
+import json
+import hashlib
+
 from grid import Grid
 from enums import CursorMoveResult
 
@@ -6,7 +9,25 @@ from enums import CursorMoveResult
 # Its only differences from the Grid class are in the way cells are activated
 # Namely, the whole row on which self.active_cell lies is displayed as active
 # It also reacts to cursor movements differently, as if it had only one column
+# Attributes:
+# - self.menu - [[str, str, int]] or CompactMenu, the displayed menu (see init_menu_grid in ui.py)
+# - self.menu_hash - str, the content hash of self.menu (see content_hash)
 class MenuGrid(Grid):
+    def __init__(self, width: int, height: int):
+        super().__init__(width, height)
+        self.menu = []
+        self.menu_hash = self.content_hash(self.menu)
+
+    # Stores the displayed menu and its content hash
+    def set_menu(self, menu: list[str, str, int]):
+        self.menu = menu
+        self.menu_hash = self.content_hash(menu)
+
+    # Returns a hash of the given menu, equal menus have equal hashes
+    @staticmethod
+    def content_hash(menu: list[str, str, int]) -> str:
+        return hashlib.blake2b(json.dumps([list(row) for row in menu]).encode(), digest_size=16).hexdigest()
+
     # Reacts to cursor movement
     # If it is moved left or right, it always propagates the movement
     # to the parent widget. Otherwise behaves the same way as a normal Grid
@@ -51,3 +72,9 @@ class MenuGrid(Grid):
 
         for column in range(len(self.columns)):
             self.get_cell(column, self.active_cell[1]).set_active(False)
+
+    # Removes a row, if it contained the selected row, the whole new selected row is activated
+    def remove_row(self, index: int):
+        super().remove_row(index)
+        if self.active:
+            self.set_active_cell(self.active_cell)
@@ -0,0 +1,70 @@
+import sys
+from collections import OrderedDict
+
+from grid import Grid
+
+
+# MenuGridCache is a bounded LRU cache of ready-built menu grids (see init_menu_grid in ui.py)
+# keyed by canteen and date, so that switching back to a recently viewed menu
+# only needs to put the cached grid back into body_grid (keeping its scroll position)
+# Every grid is stored together with the data it was built from (the week returned by
+# stw_parser.get_week), so a grid is only reused as long as that data is current
+# The least recently used grids are evicted when there are more than self.max_entries grids
+# or when their estimated memory usage exceeds self.max_bytes
+# Attributes:
+# - self.entries - OrderedDict<(str, (int, int, int)), (Grid, dict, int)>,
+# - - (grid, week the grid was built from, estimated size in bytes) by (canteen, date),
+# - - the least recently used first
+# - self.size - int, the estimated size of all cached grids in bytes
+class MenuGridCache:
+    def __init__(self, max_entries=16, max_bytes=4 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    # Returns the grid for the given key if it was built from the given week, None otherwise
+    def get(self, key: tuple, week: dict):
+        if key not in self.entries:
+            return None
+        grid, grid_week, size = self.entries[key]
+        if grid_week is not week:
+            self.remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return grid
+
+    # Stores a grid built from the given week, evicting the least recently used grids if needed
+    def put(self, key: tuple, grid: Grid, week: dict):
+        self.remove(key)
+        size = self.estimate_size(grid)
+        self.entries[key] = (grid, week, size)
+        self.size += size
+
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            self.remove(next(iter(self.entries)))
+
+    # Marks the grid for the given key as built from the given week
+    # (used when a week was downloaded again, but the grid's menu didn't change)
+    def revalidate(self, key: tuple, week: dict):
+        grid, grid_week, size = self.entries[key]
+        self.entries[key] = (grid, week, size)
+
+    def remove(self, key: tuple):
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[2]
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.size = 0
+
+    # Estimates the memory used by a grid and its child widgets in bytes
+    @staticmethod
+    def estimate_size(grid: Grid) -> int:
+        size = sys.getsizeof(grid.__dict__)
+        for row in grid.widget_grid:
+            for widget in row:
+                size += sys.getsizeof(widget) + sys.getsizeof(widget.__dict__)
+                size += sys.getsizeof(widget.parameters)
+                size += sys.getsizeof(getattr(widget, "text", ""))
+        return size
@@ -0,0 +1,126 @@
+import sys
+import random
+import argparse
+
+from fakeTerminal import FakeTerminal
+from menuGrid import MenuGrid
+from ui import screen, init_menu_grid, update_menu_grid
+
+
+# This file contains a randomized test of update_menu_grid (see ui.py): a menu grid that is updated
+# in place has to look exactly like a grid that is built from scratch for the new menu
+# Every run builds a grid for a random menu, moves its cursor (and leaves it in half of the runs,
+# so the grid is inactive), updates it with a random edit of the menu and compares the rendered screen
+# with the one of a rebuilt grid. The rebuilt grid is given the cursor the updated grid should have:
+# - an active grid keeps the selected row, the cursor follows it when rows are inserted or removed above it
+# - an inactive grid keeps its cursor (its row may have been removed, then the last row is selected),
+#   its scroll offset is kept as well
+# In both cases, both grids start from the scroll offset before the update. Scrolling texts keep
+# their position when they are updated (see TextLine.set_text), so it is copied to the rebuilt grid
+
+CATEGORIES = ["Tellergericht", "Vegetarisch", "Empfehlung des Tages", "Klassiker", "Pasta", "Beilage", "Wok"]
+
+DISHES = ["Currywurst mit Pommes frites", "Linsen-Dal", "Rindergulasch", "Gemüselasagne mit Tomatensauce",
+          "Hähnchenbrustfilet mit Kräuterrahmsauce, dazu Reis und Salat der Saison", "Ramen 拉麺", "Salat"]
+
+# Terminal sizes (width, height) the grids are rendered with
+SIZES = [(80, 24), (60, 10), (120, 40), (40, 7)]
+
+
+# Returns a random row of a menu in the format of stw_parser.get_menu
+def random_row(rng: random.Random) -> list:
+    return [rng.choice(CATEGORIES), rng.choice(DISHES), rng.choice([0, 150, 290, 420])]
+
+
+# Returns a random menu with up to the given number of rows
+def random_menu(rng: random.Random, max_rows: int) -> list:
+    return [random_row(rng) for row in range(rng.randint(0, max_rows))]
+
+
+# Returns the menu with random rows inserted, removed and replaced
+# (like a refreshed page, where most rows stay the same)
+def edit_menu(rng: random.Random, menu: list, max_rows: int) -> list:
+    menu = [list(row) for row in menu]
+    for edit in range(rng.randint(1, 4)):
+        action = rng.choice(["insert", "remove", "replace"])
+        if action == "insert" and len(menu) < max_rows:
+            menu.insert(rng.randint(0, len(menu)), random_row(rng))
+        elif action == "remove" and len(menu) != 0:
+            menu.pop(rng.randrange(len(menu)))
+        elif action == "replace" and len(menu) != 0:
+            menu[rng.randrange(len(menu))] = random_row(rng)
+    return menu
+
+
+# Builds a menu grid for the given menu with the given size (see Application.build_menu_grid)
+def build_grid(menu: list, width: int, height: int) -> MenuGrid:
+    menu_grid = MenuGrid(0, 0)
+    init_menu_grid(menu_grid, menu)
+    menu_grid.set_size(width, height)
+    return menu_grid
+
+
+# Runs one comparison, returns a description of the difference (None if the screens match)
+def run(rng: random.Random, max_rows: int) -> str:
+    width, height = rng.choice(SIZES)
+    term = FakeTerminal(width, height)
+    old_menu = random_menu(rng, max_rows)
+    new_menu = edit_menu(rng, old_menu, max_rows)
+
+    updated = build_grid(old_menu, width, height)
+    updated.set_active(True)
+    for move in range(rng.randint(0, max_rows)):
+        updated.move_cursor("KEY_DOWN")
+    updated.update()
+    active = rng.random() < 0.5
+    if not active:
+        updated.set_active(False)
+    old_cursor = updated.active_cell
+    old_offset = updated.y_offset
+
+    update_menu_grid(updated, new_menu)
+    updated.update()
+
+    if not active:
+        expected = (old_cursor[0], min(old_cursor[1], len(updated.rows) - 1))
+        if updated.active_cell != expected:
+            return f"the cursor of the inactive grid moved from {old_cursor} to {updated.active_cell}"
+
+    rebuilt = build_grid(new_menu, width, height)
+    if active:
+        rebuilt.set_active(True)
+        rebuilt.set_active_cell(updated.active_cell)
+    else:
+        rebuilt.active_cell = updated.active_cell
+    rebuilt.y_offset = old_offset
+    rebuilt.update()
+    for row in range(len(rebuilt.rows)):
+        for column in range(len(rebuilt.columns)):
+            rebuilt.get_cell(column, row).offset = updated.get_cell(column, row).offset
+
+    if screen(updated, term) != screen(rebuilt, term):
+        return (f"the screens differ ({'active' if active else 'inactive'} grid, {width}x{height}, "
+                f"{len(old_menu)} -> {len(new_menu)} rows, offset {updated.y_offset} instead of {rebuilt.y_offset})")
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares menu grids updated by update_menu_grid "
+                                                 "with rebuilt ones on screen")
+    parser.add_argument("--runs", type=int, default=3000,
+                        help="number of random menus and edits")
+    parser.add_argument("--max-rows", type=int, default=12,
+                        help="maximal number of rows of a menu")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the random menus")
+    arguments = parser.parse_args()
+
+    rng = random.Random(arguments.seed)
+    failures = [failure for failure in (run(rng, arguments.max_rows) for i in range(arguments.runs))
+                if failure is not None]
+    for failure in failures[:10]:
+        print(failure)
+    if len(failures) != 0:
+        print(f"Failed: {len(failures)} of {arguments.runs} runs")
+        sys.exit(1)
+    print(f"Passed: {arguments.runs} runs")
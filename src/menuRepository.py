@@ -0,0 +1,55 @@
+import asyncio
+
+from stw_parser import stored_week, cached_week, prefetch_week
+
+
+# MenuRepository gives the application access to the menus with stale-while-revalidate semantics:
+# the last known week of a canteen is returned immediately, even if it is outdated
+# (see stw_parser.CACHE_TTL), and an outdated week is downloaded again in the background
+# Weeks older than self.max_staleness are not used, they have to be downloaded before being displayed
+# Attributes:
+# - self.run_blocking - async function that runs a blocking function in a thread pool
+# - self.max_staleness - float, the maximal age of a week that is still used, in seconds
+# - self.refreshes - dict<str, asyncio.Task>, the running refreshes by canteen (raw name)
+class MenuRepository:
+    def __init__(self, run_blocking, max_staleness=6 * 60 * 60):
+        self.run_blocking = run_blocking
+        self.max_staleness = max_staleness
+        self.refreshes = dict()
+
+    # Returns the last known week of the given canteen (see stw_parser.get_week)
+    # or None if there is none or it is older than self.max_staleness
+    def get_week(self, mensa: str):
+        stored = stored_week(mensa)
+        if stored is None or stored[1] > self.max_staleness:
+            return None
+        return stored[0]
+
+    # Returns the age of the last known week of the given canteen in seconds (None if there is none)
+    @staticmethod
+    def get_age(mensa: str):
+        stored = stored_week(mensa)
+        return None if stored is None else stored[1]
+
+    # Downloads the week of the given canteen in the background if it is outdated
+    # on_refreshed(mensa, old week, new week) is called after the new week was stored
+    def revalidate(self, mensa: str, on_refreshed):
+        if cached_week(mensa) is not None or mensa in self.refreshes:
+            return
+        task = asyncio.get_running_loop().create_task(self.refresh(mensa, on_refreshed))
+        task.add_done_callback(lambda task: self.refreshes.pop(mensa, None))
+        self.refreshes[mensa] = task
+
+    async def refresh(self, mensa: str, on_refreshed):
+        old_week = self.get_week(mensa)
+        # Failed downloads are ignored, the outdated week is used until the next attempt
+        await self.run_blocking(prefetch_week, mensa)
+        new_week = stored_week(mensa)[0]
+        if new_week is not old_week:
+            on_refreshed(mensa, old_week, new_week)
+
+    # Cancels all running refreshes
+    def cancel(self):
+        for task in self.refreshes.values():
+            task.cancel()
+        self.refreshes = dict()
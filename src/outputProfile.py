@@ -0,0 +1,175 @@
+import os
+
+from blessed import Terminal
+
+
+# The 16 ANSI colors as (red, green, blue) in the order of their SGR codes
+# (30-37 / 40-47, then the bright variants 90-97 / 100-107), as in xterm
+ANSI_COLORS = [(0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0),
+               (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+               (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0),
+               (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255)]
+
+# The channel values of the 6x6x6 color cube of 256-color terminals
+CUBE_VALUES = [0, 95, 135, 175, 215, 255]
+
+# CUBE_INDEX[value] is the index of the cube value closest to the channel value
+# (precomputed, so quantizing a color to 256 colors is three lookups)
+CUBE_INDEX = [min(range(6), key=lambda i: abs(CUBE_VALUES[i] - value)) for value in range(256)]
+
+# GRAY_INDEX[value] is the index (0-23) of the closest gray of the grayscale ramp (232-255)
+GRAY_INDEX = [min(range(24), key=lambda i: abs(8 + 10 * i - value)) for value in range(256)]
+
+
+# OutputProfile wraps a Terminal and determines how colors are written to it
+# Widgets call color_rgb and on_color_rgb as on a Terminal, everything else is forwarded
+# Profiles:
+# - TRUECOLOR - 24-bit colors (up to 19 bytes per color)
+# - COLORS_256 - the nearest of the 256 colors, found via precomputed tables
+# - COLORS_16 - the nearest of the 16 ANSI colors
+# - MONOCHROME - no colors, strongly colored backgrounds (e.g. the cursor) are shown in reverse video
+# - - (the default colors are set as well, so no colors of a previous profile remain)
+# The profile is detected from the terminal's capabilities unless it is given explicitly
+# The escape sequences are cached per color, since the UI only uses a handful of colors
+# If a frame budget is given, the profile is lowered until frames fit into it, and raised again
+# (up to the detected or given profile) once frames are comfortably under it (see fit_budget)
+# Attributes:
+# - self.term - Terminal, the wrapped terminal
+# - self.profile - str, one of PROFILES
+# - self.best_profile - str, the detected or given profile, the most detailed one that is used
+# - self.frame_budget - int, the maximal size of a frame in bytes (0 if unlimited)
+# - self.growth - dict<str, float>, how many times larger a frame is in the given profile than in the next
+# - - less detailed one (measured on the last frame the profile was lowered for)
+# - self.lowered_from - int, the size of the frame the profile was just lowered for (0 if it wasn't)
+# - self.foreground, self.background - dict<(int, int, int), str>, the cached escape sequences
+class OutputProfile:
+    TRUECOLOR = "truecolor"
+    COLORS_256 = "256"
+    COLORS_16 = "16"
+    MONOCHROME = "mono"
+
+    # From the most to the least detailed
+    PROFILES = [TRUECOLOR, COLORS_256, COLORS_16, MONOCHROME]
+
+    # The part of the frame budget a frame is expected to take in the more detailed profile
+    # for the profile to be raised again (less than 1, so it doesn't change back and forth)
+    RAISE_MARGIN = 0.8
+
+    def __init__(self, term: Terminal, profile=None, frame_budget=0):
+        self.term = term
+        self.profile = profile if profile in self.PROFILES else self.detect(term)
+        self.best_profile = self.profile
+        self.frame_budget = frame_budget
+        self.growth = dict()
+        self.lowered_from = 0
+        self.foreground = dict()
+        self.background = dict()
+
+    # Everything but the colors is handled by the wrapped terminal
+    def __getattr__(self, name: str):
+        return getattr(self.term, name)
+
+    # Determines the best profile the terminal supports
+    @classmethod
+    def detect(cls, term: Terminal) -> str:
+        if not getattr(term, "does_styling", True):
+            return cls.MONOCHROME
+        if os.environ.get("COLORTERM", "").lower() in ("truecolor", "24bit"):
+            return cls.TRUECOLOR
+
+        colors = term.number_of_colors
+        if colors >= 1 << 24:
+            return cls.TRUECOLOR
+        if colors >= 256:
+            return cls.COLORS_256
+        if colors >= 8:
+            return cls.COLORS_16
+        return cls.MONOCHROME
+
+    # Sets a new profile and drops the cached escape sequences
+    def set_profile(self, profile: str):
+        self.profile = profile
+        self.foreground = dict()
+        self.background = dict()
+
+    # Lowers the profile if a frame of the given size exceeds the frame budget, and raises it again
+    # if the frame is expected to take at most RAISE_MARGIN of the budget in the more detailed profile
+    # (the frame size times the growth measured when the profile was lowered)
+    # Returns True if the profile was changed, then the frame has to be rendered again
+    # (the size of the frame rendered again is used to measure the growth)
+    def fit_budget(self, frame_bytes: int) -> bool:
+        if self.frame_budget <= 0:
+            return False
+        index = self.PROFILES.index(self.profile)
+        if self.lowered_from != 0:
+            self.growth[self.PROFILES[index - 1]] = self.lowered_from / max(1, frame_bytes)
+            self.lowered_from = 0
+
+        if frame_bytes > self.frame_budget:
+            if index == len(self.PROFILES) - 1:
+                return False
+            self.lowered_from = frame_bytes
+            self.set_profile(self.PROFILES[index + 1])
+            return True
+
+        if self.profile == self.best_profile:
+            return False
+        richer = self.PROFILES[index - 1]
+        if frame_bytes * self.growth.get(richer, float("inf")) > self.frame_budget * self.RAISE_MARGIN:
+            return False
+        self.set_profile(richer)
+        return True
+
+    def color_rgb(self, red: int, green: int, blue: int) -> str:
+        color = (red, green, blue)
+        if color not in self.foreground:
+            self.foreground[color] = self.sequence(color, False)
+        return self.foreground[color]
+
+    def on_color_rgb(self, red: int, green: int, blue: int) -> str:
+        color = (red, green, blue)
+        if color not in self.background:
+            self.background[color] = self.sequence(color, True)
+        return self.background[color]
+
+    # Returns the escape sequence that sets the given color in the current profile
+    def sequence(self, color: tuple[int, int, int], background: bool) -> str:
+        if self.profile == self.TRUECOLOR:
+            return f"\x1b[{48 if background else 38};2;{color[0]};{color[1]};{color[2]}m"
+
+        if self.profile == self.COLORS_256:
+            return f"\x1b[{48 if background else 38};5;{self.quantize_256(color)}m"
+
+        if self.profile == self.COLORS_16:
+            index = self.quantize_16(color)
+            if index < 8:
+                return f"\x1b[{(40 if background else 30) + index}m"
+            return f"\x1b[{(100 if background else 90) + index - 8}m"
+
+        # Monochrome: the default colors, only the background decides between normal and reverse video
+        if not background:
+            return "\x1b[39m"
+        return "\x1b[49;7m" if max(color) - min(color) > 128 else "\x1b[49;27m"
+
+    # Returns the index of the closest of the 256 colors (only the cube and the grayscale ramp
+    # are considered, since the first 16 colors differ between terminals)
+    @staticmethod
+    def quantize_256(color: tuple[int, int, int]) -> int:
+        red, green, blue = (CUBE_INDEX[value] for value in color)
+        cube = (CUBE_VALUES[red], CUBE_VALUES[green], CUBE_VALUES[blue])
+        gray_index = GRAY_INDEX[sum(color) // 3]
+        gray = (8 + 10 * gray_index,) * 3
+
+        if distance(color, gray) < distance(color, cube):
+            return 232 + gray_index
+        return 16 + 36 * red + 6 * green + blue
+
+    # Returns the index of the closest of the 16 ANSI colors
+    @staticmethod
+    def quantize_16(color: tuple[int, int, int]) -> int:
+        return min(range(16), key=lambda index: distance(color, ANSI_COLORS[index]))
+
+
+# Returns the squared euclidean distance between two colors
+def distance(a: tuple[int, int, int], b: tuple[int, int, int]) -> int:
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
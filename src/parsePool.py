@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from compactWeek import CompactWeek, key_date
+from menuArchive import encode_segment, decode_segment
+from stw_parser import parse_week
+
+
+# ParsePool parses weekly menu pages (see stw_parser.parse_week) in worker processes
+# Parsing is CPU-bound and holds the GIL, so downloads in a thread pool (e.g. stw_parser.get_all_weeks)
+# parse one page at a time. With a ParsePool set (see stw_parser.set_parse_pool), the pages are
+# downloaded completely and parsed in the workers instead, so bulk workloads (exports, prefetching
+# all canteens, backfilling the history) use all cores. The TUI uses it with "--parse-workers N"
+# (see main.py) for the weeks of all canteens it downloads in the background, but not for the menu
+# the user waits for: that page is parsed while it is downloaded to show the first days early
+# The workers are started and warmed up (modules imported, a sample page parsed) when the pool
+# is created, so the first pages don't pay for it
+# A worker returns the week in the column format of the menu archive (see menuArchive.encode_segment)
+# instead of the pickled week: one bytes object with every text stored once is cheaper to send
+# Attributes:
+# - self.workers - int, the number of worker processes
+# - self.executor - ProcessPoolExecutor
+class ParsePool:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+        # Every task that finds no idle worker starts a new one, so this starts all of them
+        for future in [self.executor.submit(time.sleep, 0.01) for i in range(self.workers)]:
+            future.result()
+
+    # Parses the weekly menu page (bytes) of the given canteen in a worker
+    # Returns the week (see stw_parser.parse_week), raises the errors of parse_week
+    def parse(self, mensa: str, page: bytes) -> CompactWeek:
+        return decode_week(self.executor.submit(parse_page, mensa, page).result())
+
+    # Parses several pages at once, pages - [(raw canteen name, page)]
+    # Returns the weeks in the order of the pages
+    def parse_all(self, pages: list[tuple[str, bytes]]) -> list[CompactWeek]:
+        futures = [self.executor.submit(parse_page, mensa, page) for mensa, page in pages]
+        return [decode_week(future.result()) for future in futures]
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        return False
+
+
+# A minimal page with one day, parsed by every worker on start
+SAMPLE_PAGE = (b'<div class="accordion"><div class="default-headline"><h3><a>Montag, 09.12.2024</a></h3>'
+               b'<div><table class="menues"><tbody><tr><td><span class="menue-item menue-category">'
+               b'Tellergericht</span><span class="menue-item menue-desc"><span>Eintopf</span></span>'
+               b'<span class="menue-item menue-price large-price">2,00 \xe2\x82\xac</span></td></tr></tbody>'
+               b'</table></div></div></div>')
+
+
+# Runs in every worker on start: parsing the sample page imports and initializes BeautifulSoup
+# and the parsers, the result doesn't matter
+def warm_up():
+    try:
+        parse_week([SAMPLE_PAGE])
+    except (AttributeError, IndexError, ValueError):
+        pass
+
+
+# Runs in a worker: parses the page and returns the week encoded by menuArchive.encode_segment
+def parse_page(mensa: str, page: bytes) -> bytes:
+    return encode_segment(mensa, 0.0, list(parse_week([page]).menus.items()))
+
+
+# Decodes a week returned by parse_page
+def decode_week(data: bytes) -> CompactWeek:
+    mensa, archived, days = decode_segment(data)
+    return CompactWeek((key_date(ordinal), menu) for ordinal, menu in days)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the parse throughput of weekly menu pages "
+                                                 "in one process and in a ParsePool")
+    parser.add_argument("pages", metavar="PAGE", nargs='+',
+                        help="saved weekly menu pages (HTML files)")
+    parser.add_argument("--workers", type=int, action="append",
+                        help="numbers of worker processes to measure (default: 1, 2, 4, ... up to the cores)")
+    parser.add_argument("--repeat", type=int, default=10,
+                        help="how often every page is parsed")
+    arguments = parser.parse_args()
+
+    pages = []
+    for path in arguments.pages:
+        with open(path, "rb") as file:
+            pages.append((os.path.basename(path), file.read()))
+    pages *= arguments.repeat
+    workers = arguments.workers
+    if workers is None:
+        workers = [1 << i for i in range((os.cpu_count() or 1).bit_length()) if 1 << i <= (os.cpu_count() or 1)]
+
+    start = time.perf_counter()
+    expected = [parse_week([page]) for mensa, page in pages]
+    single = len(pages) / (time.perf_counter() - start)
+    print(f"{'single process':>16}{single:>10.1f} pages/s")
+    for count in workers:
+        with ParsePool(count) as pool:
+            start = time.perf_counter()
+            weeks = pool.parse_all(pages)
+            throughput = len(pages) / (time.perf_counter() - start)
+        if weeks != expected:
+            print(f"{count} workers: the weeks differ from the ones parsed in one process", file=sys.stderr)
+            sys.exit(1)
+        print(f"{f'{count} workers':>16}{throughput:>10.1f} pages/s{throughput / single:>8.2f}x")
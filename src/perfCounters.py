@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+# PerfCounters collects lightweight performance measurements of the running program
+# The render loop in main.py and the fetching functions in stw_parser.py feed it,
+# the PerfHud widget (see perfHud.py) displays it
+# Recording a measurement is just an assignment, so the counters can always stay enabled
+# Attributes:
+# - self.frame_time - float, seconds between the last two frames (smoothed)
+# - self.render_time - float, seconds needed to render the last frame (smoothed)
+# - self.frame_bytes - int, bytes written to the terminal for the last frame
+# - self.frame_writes - int, system calls needed to write the last frame
+# - self.fetch_time - float, seconds the last download of a menu page took
+# - self.parse_time - float, seconds parsing the last menu page took
+# - self.cache_hits - int, number of menu requests answered from the cache
+# - self.cache_misses - int, number of menu requests that needed a download
+# - self.last_frame - float, time.perf_counter() value of the last frame
+# - self.frames - list<(float, int)>, render time and size of every frame
+# - - (only kept if it is set to a list, e.g. when replaying a session, None otherwise)
+# - self.memory - int, the memory usage of the process in bytes when it was last read
+# - - (None if it was never read or can't be read)
+# - self.memory_checked - float, time.perf_counter() value of the last time the memory usage was read
+class PerfCounters:
+    # Weight of the newest measurement in the smoothed values
+    SMOOTHING = 0.2
+
+    # Memory usage is read from the OS at most this often (in seconds)
+    MEMORY_INTERVAL = 1.0
+
+    def __init__(self):
+        self.frame_time = 0.0
+        self.render_time = 0.0
+        self.frame_bytes = 0
+        self.frame_writes = 0
+        self.fetch_time = 0.0
+        self.parse_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.last_frame = 0.0
+        self.frames = None
+        self.memory = None
+        self.memory_checked = 0.0
+
+    # Records a written frame, its render time in seconds, its size in bytes
+    # and the number of system calls needed to write it
+    def record_frame(self, render_time: float, frame_bytes: int, frame_writes=1):
+        now = time.perf_counter()
+        if self.last_frame != 0.0:
+            self.frame_time += (now - self.last_frame - self.frame_time) * self.SMOOTHING
+        self.last_frame = now
+        self.render_time += (render_time - self.render_time) * self.SMOOTHING
+        self.frame_bytes = frame_bytes
+        self.frame_writes = frame_writes
+        if self.frames is not None:
+            self.frames.append((render_time, frame_bytes))
+
+    def record_fetch(self, fetch_time: float):
+        self.fetch_time = fetch_time
+
+    def record_parse(self, parse_time: float):
+        self.parse_time = parse_time
+
+    # Records if a request could be answered from the cache
+    def record_cache(self, hit: bool):
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    # Returns the share of requests answered from the cache (from 0 to 1)
+    def cache_hit_rate(self) -> float:
+        requests = self.cache_hits + self.cache_misses
+        return self.cache_hits / requests if requests != 0 else 0.0
+
+    # Returns the resident memory of the process in bytes
+    # or None if it can't be determined on this platform
+    # The value is cached for MEMORY_INTERVAL seconds
+    def memory_usage(self):
+        now = time.perf_counter()
+        if self.memory is not None and now - self.memory_checked < self.MEMORY_INTERVAL:
+            return self.memory
+        self.memory_checked = now
+
+        try:
+            with open("/proc/self/statm") as statm:
+                self.memory = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            return self.memory
+        except (OSError, ValueError, AttributeError):
+            pass
+
+        # Falls back to the peak memory usage, which is given
+        # in bytes on macOS and in kilobytes on other systems
+        if resource is not None:
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.memory = max_rss if sys.platform == "darwin" else max_rss * 1024
+        return self.memory
+
+
+# The counters shared by the whole program
+counters = PerfCounters()
@@ -0,0 +1,34 @@
+from textLine import TextLine
+from perfCounters import PerfCounters
+
+
+# PerfHud is a TextLine that displays the current values of a PerfCounters object
+# (see perfCounters.py). It is shown in place of the footer when toggled by the user
+# The text is refreshed on every update, so the values are always live
+# The footer doesn't scroll, so the values are abbreviated to fit in 80 columns:
+# " frame 17/1.2 ms | 12.3 KiB/1 wr | fetch 120/23 ms | hit 85% | 45 MiB" stands for
+# frame time/render time, bytes/system calls per frame, fetch time/parse time of the last page,
+# cache hit rate and memory usage
+# Attributes:
+# - self.counters - PerfCounters, the displayed counters
+class PerfHud(TextLine):
+    def __init__(self, width: int, height: int, counters: PerfCounters):
+        super().__init__(width, height)
+        self.counters = counters
+        self.parameters["inactive_text"] = (255, 255, 255)
+        self.parameters["inactive_background"] = (0, 0, 96)
+        # The values change in every update
+        self.parameters["cached_layout"] = False
+        self.update()
+
+    # Refreshes the displayed text
+    def update(self):
+        counters = self.counters
+        memory = counters.memory_usage()
+        self.set_text(
+            f" frame {counters.frame_time * 1000:.0f}/{counters.render_time * 1000:.1f} ms"
+            f" | {counters.frame_bytes / 1024:.1f} KiB/{counters.frame_writes} wr"
+            f" | fetch {counters.fetch_time * 1000:.0f}/{counters.parse_time * 1000:.0f} ms"
+            f" | hit {counters.cache_hit_rate() * 100:.0f}%"
+            f" | {'n/a' if memory is None else f'{memory / (1 << 20):.0f}'} MiB"
+        )
@@ -0,0 +1,110 @@
+import time
+import asyncio
+
+from usageStats import UsageStats
+from stw_parser import prefetch_week, cached_week
+
+
+# Prefetcher warms the menu cache (see stw_parser.get_week) in the background
+# for the canteens that are likely to be opened next:
+# the neighbors of the opened canteen tab and the most frequently opened canteens.
+# (Day tabs need no prefetching, since one page contains the menus of the whole week)
+# Prefetches are limited by
+# - a concurrency budget: at most self.max_concurrent downloads at once
+# - a bandwidth budget: on average at most self.bytes_per_second downloaded bytes per second
+# Prefetches of canteens that are no longer likely to be opened are cancelled while they wait
+# for the budgets. A download that already started can't be interrupted (it runs in a thread pool),
+# so its prefetch is kept: it finishes within the budgets and its week is cached for later
+# The weeks of all canteens are prefetched after the start as well (see prefetch_all),
+# one at a time and within the same budgets, so the likely canteens aren't slowed down by them
+# Attributes:
+# - self.run_blocking - async function that runs a blocking function in a thread pool
+# - self.usage_stats - UsageStats, the local usage statistics
+# - self.max_concurrent - int
+# - self.bytes_per_second - int
+# - self.frequent - int, the number of most frequently opened canteens that are prefetched
+# - self.tasks - dict<str, asyncio.Task>, the running prefetches by canteen (raw name)
+# - self.downloading - set<str>, the canteens (raw names) whose prefetches are downloading
+# - self.budget - float, the number of bytes that may be downloaded now (negative if overspent)
+# - self.budget_time - float, time.monotonic() value of the last budget refill
+class Prefetcher:
+    def __init__(self, run_blocking, usage_stats: UsageStats,
+                 max_concurrent=2, bytes_per_second=256 * 1024, frequent=2):
+        self.run_blocking = run_blocking
+        self.usage_stats = usage_stats
+        self.max_concurrent = max_concurrent
+        self.bytes_per_second = bytes_per_second
+        self.frequent = frequent
+        self.tasks = dict()
+        self.downloading = set()
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.budget = float(bytes_per_second)
+        self.budget_time = time.monotonic()
+
+    # Returns the canteens worth prefetching when the canteen with the given index
+    # in the list of all canteens (raw names, in tab order) is opened
+    def get_targets(self, mensas: list[str], index: int) -> list[str]:
+        targets = [mensas[i] for i in (index + 1, index - 1) if 0 <= i < len(mensas)]
+        for mensa in self.usage_stats.most_frequent(len(mensas)):
+            if len(targets) >= 2 + self.frequent:
+                break
+            if mensa != mensas[index] and mensa not in targets:
+                targets.append(mensa)
+        return targets
+
+    # Starts prefetching the given canteens (raw names) in the given order
+    # Waiting prefetches for canteens that are not among them are cancelled
+    def set_targets(self, targets: list[str]):
+        for mensa in list(self.tasks):
+            if mensa not in targets and mensa not in self.downloading:
+                self.tasks.pop(mensa).cancel()
+
+        for mensa in targets:
+            if mensa in self.tasks or cached_week(mensa) is not None:
+                continue
+            task = asyncio.get_running_loop().create_task(self.prefetch(mensa))
+            task.add_done_callback(lambda task, mensa=mensa: self.on_prefetch_done(mensa, task))
+            self.tasks[mensa] = task
+
+    # Removes a finished prefetch, unless it was already replaced by a newer one
+    def on_prefetch_done(self, mensa: str, task: asyncio.Task):
+        if self.tasks.get(mensa) is task:
+            del self.tasks[mensa]
+
+    # Cancels all running prefetches
+    def cancel(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks = dict()
+
+    # Downloads the week of the given canteen within the budgets
+    async def prefetch(self, mensa: str):
+        async with self.semaphore:
+            await self.wait_for_budget()
+            self.downloading.add(mensa)
+            try:
+                self.budget -= await self.run_blocking(prefetch_week, mensa)
+            finally:
+                self.downloading.discard(mensa)
+
+    # Downloads the weeks of the given canteens (raw names) one after another within the budgets
+    # Canteens that are cached or being prefetched as targets (see set_targets) are skipped
+    async def prefetch_all(self, mensas: list[str]):
+        for mensa in mensas:
+            if mensa not in self.tasks and cached_week(mensa) is None:
+                await self.prefetch(mensa)
+
+    # Waits until the bandwidth budget is no longer overspent
+    async def wait_for_budget(self):
+        self.refill_budget()
+        if self.budget < 0:
+            await asyncio.sleep(-self.budget / self.bytes_per_second)
+            self.refill_budget()
+
+    # Adds the bytes allowed since the last refill to the budget
+    # At most one second worth of bytes can be saved up
+    def refill_budget(self):
+        now = time.monotonic()
+        self.budget = min(float(self.bytes_per_second),
+                          self.budget + (now - self.budget_time) * self.bytes_per_second)
+        self.budget_time = now
@@ -0,0 +1,134 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+
+
+# The minimal length of the word suffixes stored in the index (see SearchIndex)
+MIN_SUFFIX_LENGTH = 3
+
+
+# SearchIndex is an inverted index over the dishes of the downloaded weeks of all canteens
+# Every dish ([category, dish name, price], see stw_parser.get_week) is a record,
+# and the index maps the normalized words of its category and name to the record
+# Texts are normalized by case folding and removing accents, so "vegan" finds "Vegan"
+# and "gemuse" finds "Gemüse" (see normalize)
+# A query word matches every word it is a prefix of. German dish names are often compound words,
+# so all suffixes of a word are indexed as well, and "schnitzel" also finds "Schweineschnitzel"
+# The suffixes are kept in a sorted list, so the matches of a query word are found by binary search
+# The index is updated whenever a week is downloaded (see stw_parser.add_week_listener),
+# which happens in the thread pool, so it is guarded by a lock
+# Attributes:
+# - self.records - dict<int, (record, [str])>, the records by their ids with their index keys
+# - - record - (raw canteen name, (day, month, year), row, category, dish, price, normalized text)
+# - self.record_ids - dict<str, [int]>, the ids of the records of each canteen (raw name)
+# - self.postings - dict<str, set<int>>, the ids of the records containing each key
+# - self.keys - [str], the sorted keys of self.postings
+# - self.next_id - int, the id of the next added record
+# - self.version - int, incremented on every change, so that displayed results can be refreshed
+# - self.lock - threading.Lock
+class SearchIndex:
+    def __init__(self):
+        self.records = dict()
+        self.record_ids = dict()
+        self.postings = dict()
+        self.keys = []
+        self.next_id = 0
+        self.version = 0
+        self.lock = threading.Lock()
+
+    # Indexes the week of the given canteen (see stw_parser.get_week for the format),
+    # replacing the previously indexed week of the canteen
+    def add_week(self, mensa: str, week: dict[tuple[int, int, int], list[str, str, int]]):
+        # The records are prepared before locking, so that searches aren't blocked meanwhile
+        records = []
+        for date, menu in week.items():
+            for row, (category, dish, price) in enumerate(menu):
+                text = normalize(f"{category} {dish}")
+                records.append(((mensa, date, row, category, dish, price, text), index_keys(text)))
+
+        with self.lock:
+            self.remove_records(mensa)
+            ids = list(range(self.next_id, self.next_id + len(records)))
+            self.next_id += len(records)
+            for record_id, (record, keys) in zip(ids, records):
+                self.records[record_id] = (record, keys)
+                for key in keys:
+                    self.postings.setdefault(key, set()).add(record_id)
+            self.record_ids[mensa] = ids
+            self.keys = sorted(self.postings)
+            self.version += 1
+
+    # Removes the records of the given canteen, the caller has to hold self.lock
+    def remove_records(self, mensa: str):
+        for record_id in self.record_ids.pop(mensa, []):
+            record, keys = self.records.pop(record_id)
+            for key in keys:
+                ids = self.postings[key]
+                ids.discard(record_id)
+                if len(ids) == 0:
+                    del self.postings[key]
+
+    # Returns the records matching all words of the query, ordered by date, canteen and row
+    # Output format: [(raw canteen name, (day, month, year), row, category, dish, price)]
+    def search(self, query: str) -> list[tuple[str, tuple[int, int, int], int, str, str, int]]:
+        words = normalize(query).split()
+        if len(words) == 0:
+            return []
+
+        # Words shorter than MIN_SUFFIX_LENGTH would match most of the keys,
+        # so they are only looked up in the texts of the records matching the other words
+        long_words = [word for word in words if len(word) >= MIN_SUFFIX_LENGTH]
+        short_words = [word for word in words if len(word) < MIN_SUFFIX_LENGTH]
+        with self.lock:
+            if len(long_words) == 0:
+                matches = set(self.records)
+            else:
+                matches = None
+                for word in sorted(long_words, key=len, reverse=True):
+                    ids = self.lookup(word)
+                    matches = ids if matches is None else matches & ids
+                    if len(matches) == 0:
+                        return []
+            records = [self.records[record_id][0] for record_id in matches]
+
+        records = [record for record in records if all(word in record[6] for word in short_words)]
+        records.sort(key=lambda record: (record[1][2], record[1][1], record[1][0], record[0], record[2]))
+        return [record[:6] for record in records]
+
+    # Returns the ids of the records containing a key that starts with the given word,
+    # the caller has to hold self.lock
+    def lookup(self, word: str) -> set[int]:
+        ids = set()
+        for index in range(bisect_left(self.keys, word), len(self.keys)):
+            key = self.keys[index]
+            if not key.startswith(word):
+                break
+            ids |= self.postings[key]
+        return ids
+
+
+# Case-folds the text, removes accents (e.g. "Gemüse" -> "gemuse")
+# and replaces everything except letters and digits by spaces
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[\W_]+", ' ', text)
+
+
+# Returns a function that accepts the texts containing all words of the query
+# (unlike SearchIndex.search, this doesn't need an index, e.g. for checking a few texts)
+def matches(query: str):
+    words = normalize(query).split()
+    return lambda text: all(word in normalize(text) for word in words)
+
+
+# Returns the keys a normalized text is indexed by: the suffixes of its words
+# that are at least MIN_SUFFIX_LENGTH characters long, and the whole words
+def index_keys(text: str) -> list[str]:
+    keys = set()
+    for word in text.split():
+        keys.add(word)
+        for start in range(1, len(word) - MIN_SUFFIX_LENGTH + 1):
+            keys.add(word[start:])
+    return list(keys)
@@ -0,0 +1,45 @@
+from grid import Grid
+from textLine import TextLine
+from textBlock import TextBlock
+from enums import Unit
+
+
+# SearchView is a Grid with a search field in its first row and the list of results below it
+# (used for searching dishes across all canteens and days, see Application.toggle_search)
+# The view only displays the query and the results, the search itself is done by the application
+# Attributes:
+# - self.query - str, the entered query
+# - self.input - TextLine, displays the query
+# - self.results - TextBlock, displays one result per line
+class SearchView(Grid):
+    # The text displayed in front of the query
+    PROMPT = "Search: "
+
+    def __init__(self, width: int, height: int):
+        super().__init__(width, height)
+        self.query = ""
+        self.input = TextLine(0, 0, self.PROMPT)
+        self.results = TextBlock(0, 0)
+        # The query and the results change with every key
+        self.input.set_parameter("cached_layout", False)
+        self.results.set_parameter("cached_layout", False)
+        self.set_grid([(1, Unit.CELLS), (100, Unit.PERCENTS)], [(100, Unit.PERCENTS)])
+        self.set_cell(0, 0, self.input)
+        self.set_cell(0, 1, self.results)
+
+    # Sets the query and displays it with a cursor behind it
+    def set_query(self, query: str):
+        self.query = query
+        self.input.set_text(self.PROMPT + query + '_')
+
+    # Getter for self.query
+    def get_query(self) -> str:
+        return self.query
+
+    # Displays the given lines as results
+    def set_results(self, lines: list[str]):
+        self.results.set_lines(lines)
+
+    # Returns the number of result lines that fit into the view
+    def get_result_capacity(self) -> int:
+        return max(0, self.height - 1)
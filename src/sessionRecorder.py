@@ -0,0 +1,90 @@
+import json
+import time
+
+from blessed import Terminal
+from stw_parser import cached_weeks, add_week_listener
+
+
+# SessionRecorder wraps a Terminal and records a session for replaying it later (see sessionReplayer.py)
+# Recorded are the keys returned by inkey, the size changes of the terminal and the weeks
+# put into the menu cache (see stw_parser.put_week), with the seconds since the start of the recording
+# The first week of every canteen is stored in "weeks" (the replay starts with them),
+# every later one (e.g. refreshed in the background) is a "week" event
+# Everything else is forwarded to the wrapped terminal
+# Recording format (JSON):
+# {"width": int, "height": int,
+#  "events": [{"time": float, "type": "key", "key": str, "name": str or null}
+#             or {"time": float, "type": "resize", "width": int, "height": int}
+#             or {"time": float, "type": "week", "mensa": raw canteen name, "days": [[[day, month, year], menu]]}],
+#  "weeks": {raw canteen name: {"time": float, "days": [[[day, month, year], menu]]}}}
+# Attributes:
+# - self.term - Terminal, the wrapped terminal
+# - self.start - float, time.monotonic() value of the start of the recording
+# - self.initial_size - (int, int), the size of the terminal at the start of the recording
+# - self.size - (int, int), the last recorded size of the terminal
+# - self.events - list<dict>, the recorded events
+# - self.weeks - dict<str, dict>, the first week of every canteen (see "weeks" above)
+class SessionRecorder:
+    def __init__(self, term: Terminal):
+        self.term = term
+        self.start = time.monotonic()
+        self.initial_size = (term.width, term.height)
+        self.size = self.initial_size
+        self.events = []
+        self.weeks = {mensa: {"time": 0.0, "days": encode_days(week)}
+                      for mensa, (fetched, week) in cached_weeks().items()}
+        add_week_listener(self.on_week)
+
+    # Everything but the recorded methods is handled by the wrapped terminal
+    def __getattr__(self, name: str):
+        return getattr(self.term, name)
+
+    @property
+    def width(self) -> int:
+        self.check_size()
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        self.check_size()
+        return self.size[1]
+
+    # Records a resize if the size of the terminal changed
+    def check_size(self):
+        size = (self.term.width, self.term.height)
+        if size != self.size:
+            self.size = size
+            self.events.append({"time": self.elapsed(), "type": "resize", "width": size[0], "height": size[1]})
+
+    def inkey(self, *args, **kwargs):
+        key = self.term.inkey(*args, **kwargs)
+        if key:
+            self.events.append({"time": self.elapsed(), "type": "key", "key": str(key), "name": key.name})
+        return key
+
+    # Records a week put into the menu cache (called from the thread pool, see stw_parser.add_week_listener)
+    def on_week(self, mensa: str, week: dict):
+        if mensa not in self.weeks:
+            self.weeks[mensa] = {"time": self.elapsed(), "days": encode_days(week)}
+        else:
+            self.events.append({"time": self.elapsed(), "type": "week", "mensa": mensa, "days": encode_days(week)})
+
+    # Returns the seconds since the start of the recording
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    # Returns the recording (see the format above)
+    # The events are sorted, since the weeks are recorded in other threads than the keys
+    def get_recording(self) -> dict:
+        return {"width": self.initial_size[0], "height": self.initial_size[1],
+                "events": sorted(self.events, key=lambda event: event["time"]), "weeks": dict(self.weeks)}
+
+    # Stores the recording in a file
+    def save(self, path: str):
+        with open(path, 'w', encoding="utf-8") as file:
+            json.dump(self.get_recording(), file)
+
+
+# Converts the days of a week (see stw_parser.get_week) to JSON (the dates become lists)
+def encode_days(week: dict) -> list:
+    return [[list(date), [list(row) for row in menu]] for date, menu in week.items()]
@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+
+from blessed.keyboard import Keystroke
+from fakeTerminal import FakeTerminal
+from outputProfile import OutputProfile
+from frameWriter import FrameWriter
+from usageStats import UsageStats
+from application import Application
+from perfCounters import counters
+from ui import build_ui
+from stw_parser import (RAW_TO_FORMATTED_MENSA, store_week, get_available_days, get_menu, add_week_listener,
+                        remove_week_listener)
+
+# This file replays sessions recorded with "python main.py --record FILE" (see sessionRecorder.py)
+# The program is run against a FakeTerminal with the recorded keys, resizes and menus,
+# so replays need neither a terminal nor a network connection and always see the same data
+# The replay starts with the first recorded week of every canteen, the weeks downloaded later
+# are put into the menu cache at their recorded times, like weeks refreshed in the background
+# Sessions are replayed either as fast as possible (every event is handled and rendered
+# on its own, which makes the frames deterministic) or in real time (with the recorded
+# timing, the animation and the coalescing of keys, like in the real program)
+# The render time and size of every frame are collected, and the results can be compared
+# with a stored baseline, so that recordings can serve as a regression suite
+# Run "python sessionReplayer.py --help" for the available options
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+# Returns the recorded week of the given canteen (see stw_parser.get_week), empty if it wasn't recorded
+def recorded_week(recording: dict, mensa: str) -> dict[tuple[int, int, int], list[str, str, int]]:
+    week = recording["weeks"].get(mensa)
+    return dict() if week is None else {tuple(date): menu for date, menu in week["days"]}
+
+
+# Puts the recorded menus into the menu cache, canteens that weren't recorded get an empty week
+def install_weeks(recording: dict):
+    for mensa in RAW_TO_FORMATTED_MENSA:
+        store_week(mensa, recorded_week(recording, mensa))
+
+
+def to_keystroke(event: dict) -> Keystroke:
+    return Keystroke(event["key"], name=event["name"])
+
+
+# Puts the week of a "week" event into the menu cache and updates the menu grids of its canteen
+# like a week refreshed in the background (see Application.on_week_refreshed)
+def apply_week(application: Application, event: dict):
+    mensa = event["mensa"]
+    old_week = application.repository.get_week(mensa)
+    store_week(mensa, {tuple(date): menu for date, menu in event["days"]})
+    application.on_week_refreshed(mensa, old_week, application.repository.get_week(mensa))
+
+
+# Builds the application like main.py does, but against a FakeTerminal and writing to devnull
+# Usage statistics are neither read nor stored
+def create_application(recording: dict, devnull) -> Application:
+    term = OutputProfile(FakeTerminal(recording["width"], recording["height"]), OutputProfile.TRUECOLOR)
+    days = get_available_days()
+    if len(days) == 0:
+        raise ValueError("The recording contains no menus")
+
+    application = Application(term, build_ui(term, days), FrameWriter(devnull, False), UsageStats(os.devnull))
+    mensa, date = application.get_selection()
+    application.set_menu(mensa, date, get_menu(mensa, *date))
+    return application
+
+
+# Handles the events one after another, waits for the resulting fetches and renders a frame after each
+async def replay_fast(application: Application, events: list[dict]):
+    application.SETTLE_DELAY = 0
+    # The search index is kept up to date with the recorded weeks like in Application.run_async
+    add_week_listener(application.search_index.add_week)
+    try:
+        application.render()
+        for event in events:
+            if event["type"] == "resize":
+                application.term.set_size(event["width"], event["height"])
+            elif event["type"] == "week":
+                apply_week(application, event)
+            elif event["key"] == 'q' and not application.search_shown():
+                break
+            else:
+                application.handle_keys([to_keystroke(event)])
+
+            for task in (application.fetch_task, application.weeks_task):
+                if task is not None:
+                    await asyncio.wait([task])
+            application.render()
+    finally:
+        remove_week_listener(application.search_index.add_week)
+    application.executor.shutdown()
+
+
+# Runs the application and feeds it the events at the recorded times
+async def replay_realtime(application: Application, events: list[dict]):
+    loop = asyncio.get_running_loop()
+    run = loop.create_task(application.run_async())
+    start = loop.time()
+    for event in events:
+        await asyncio.sleep(max(0.0, start + event["time"] - loop.time()))
+        if run.done():
+            break
+        if event["type"] == "resize":
+            application.term.set_size(event["width"], event["height"])
+            application.invalidate()
+        elif event["type"] == "week":
+            apply_week(application, event)
+        else:
+            application.term.push_key(to_keystroke(event))
+
+    if not run.done():
+        application.term.push_key('q')
+    await run
+
+
+# Replays a recording and returns the render time in seconds and the size in bytes of every frame
+def replay(recording: dict, realtime=False) -> list[tuple[float, int]]:
+    install_weeks(recording)
+    counters.frames = []
+    try:
+        with open(os.devnull, 'w') as devnull:
+            application = create_application(recording, devnull)
+            asyncio.run((replay_realtime if realtime else replay_fast)(application, recording["events"]))
+        return counters.frames
+    finally:
+        counters.frames = None
+
+
+# Summarizes the frames of a replay
+def summarize(frames: list[tuple[float, int]]) -> dict:
+    times = sorted(render_time for render_time, frame_bytes in frames)
+    total_bytes = sum(frame_bytes for render_time, frame_bytes in frames)
+    return {
+        "frames": len(frames),
+        "mean_seconds": sum(times) / len(times) if len(times) != 0 else 0.0,
+        "p95_seconds": times[int(len(times) * 0.95)] if len(times) != 0 else 0.0,
+        "max_seconds": times[-1] if len(times) != 0 else 0.0,
+        "total_bytes": total_bytes
+    }
+
+
+# Prints one line of the results table
+def report(key: str, result: dict, baseline=None):
+    line = (f"{key:<36}"
+            f"{result['frames']:>8} frames"
+            f"{result['mean_seconds'] * 1000:>10.3f} ms"
+            f"{result['p95_seconds'] * 1000:>10.3f} ms p95"
+            f"{result['max_seconds'] * 1000:>10.3f} ms max"
+            f"{result['total_bytes']:>12} B")
+    if baseline is not None:
+        line += (f"{result['p95_seconds'] / max(baseline['p95_seconds'], 1e-9):>8.2f}x"
+                 f"{result['total_bytes'] / max(baseline['total_bytes'], 1):>8.2f}x B")
+    print(line)
+
+
+# Compares the results with a stored baseline and prints the comparison
+# Returns the list of recordings whose 95th percentile frame time or output bytes
+# exceed the baseline by more than the given tolerance (e.g. 0.1 for 10%)
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    print()
+    print("Comparison with the baseline (p95 frame time and bytes relative to the baseline):")
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        report(key, result, baseline[key])
+        if (result["p95_seconds"] > baseline[key]["p95_seconds"] * (1 + tolerance)
+                or result["total_bytes"] > baseline[key]["total_bytes"] * (1 + tolerance)):
+            regressions.append(key)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replays recorded sessions of the Mensa TUI")
+    parser.add_argument("recordings", metavar="RECORDING", nargs='+',
+                        help="a session recorded with \"python main.py --record FILE\"")
+    parser.add_argument("--realtime", action="store_true",
+                        help="replays with the recorded timing instead of as fast as possible")
+    parser.add_argument("--frames", action="store_true",
+                        help="prints the render time and size of every frame")
+    parser.add_argument("--save", metavar="FILE",
+                        help="stores the results as a baseline in FILE")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="compares the results with the baseline stored in FILE")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="relative increase of frame time or bytes that counts as a regression")
+    arguments = parser.parse_args()
+
+    results = dict()
+    for path in arguments.recordings:
+        frames = replay(load(path), arguments.realtime)
+        if arguments.frames:
+            for index, (render_time, frame_bytes) in enumerate(frames):
+                print(f"{path} frame {index:<6}{render_time * 1000:>10.3f} ms{frame_bytes:>10} B")
+        key = os.path.basename(path)
+        results[key] = summarize(frames)
+        report(key, results[key])
+
+    if arguments.save:
+        with open(arguments.save, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            regressions = compare(results, json.load(file), arguments.tolerance)
+        if len(regressions) != 0:
+            print()
+            print("Regressions: " + ", ".join(regressions))
+            sys.exit(1)
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import closing
+
+from compactWeek import CompactWeek
+
+
+# SharedCache is a menu cache shared by all instances of the program on one host
+# (e.g. on a login server where many users run the program at the same time)
+# The weeks (see stw_parser.get_week) are stored in an SQLite database in WAL mode,
+# so any number of processes can read it while one of them writes
+# When a week is outdated, only one process downloads it again: it holds a lease
+# for the canteen in the database, while the other processes use the outdated week
+# or, if there is none yet, wait until the new one is stored
+# If the database can't be used (e.g. missing permissions), weeks are downloaded directly
+# The database file and the -wal and -shm files SQLite creates next to it (and deletes when
+# the last connection is closed) are made writable by all users by whoever creates them
+# (see share_files). Every instance keeps a connection open, so the files are only created
+# (and shared) by the first instance and exist until the last one exits
+# The directory has to be writable by all users of the program as well,
+# e.g. a directory shared by their group with the setgid bit and without the sticky bit
+# Menus read from the database are stripped of control characters, since they are
+# printed to the terminal and the database may be writable by other users
+# Attributes:
+# - self.path - str, the path of the database file
+# - self.ttl - float, the seconds after which a week is outdated
+# - self.clock - function returning the current time in seconds since the epoch (time.time by default),
+#   the download times and leases are stored with it
+# - self.connection - sqlite3.Connection, kept open and unused (None if the database can't be used)
+class SharedCache:
+    # Seconds a process may take to refresh a week before another process takes over
+    LEASE_TIME = 30.0
+
+    # Seconds between two checks while waiting for another process to store a week
+    POLL_INTERVAL = 0.1
+
+    # Seconds to wait for the database to be unlocked
+    TIMEOUT = 5.0
+
+    def __init__(self, path: str, ttl: float, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self.connection = None
+        self.initialize()
+
+    # Creates the database if it doesn't exist yet and shares its files
+    # The connection stays open, so SQLite doesn't delete the -wal and -shm files while the program runs
+    def initialize(self):
+        try:
+            connection = self.connect()
+        except sqlite3.Error:
+            return
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS weeks "
+                               "(mensa TEXT PRIMARY KEY, fetched REAL NOT NULL, week TEXT NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS leases "
+                               "(mensa TEXT PRIMARY KEY, expires REAL NOT NULL)")
+            share_files(self.path)
+            self.connection = connection
+        except sqlite3.Error:
+            connection.close()
+
+    # Opens a new connection (connections can't be shared between the threads of the thread pool)
+    # Transactions are started explicitly
+    # The first read of the database creates its -wal and -shm files if no other process has it open
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=self.TIMEOUT, isolation_level=None)
+        try:
+            connection.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        except sqlite3.Error:
+            connection.close()
+            raise
+        return connection
+
+    # Returns the week of the given canteen, its age in seconds and the number of downloaded bytes
+    # download(mensa) downloads and parses a week and returns it with the number of downloaded bytes
+    def get_week(self, mensa: str, download) -> tuple[dict, float, int]:
+        try:
+            stored = self.read(mensa)
+            if stored is not None and stored[1] < self.ttl:
+                return stored[0], stored[1], 0
+
+            if self.acquire_lease(mensa):
+                try:
+                    week, size = download(mensa)
+                except BaseException:
+                    self.release_lease(mensa)
+                    raise
+                self.store(mensa, week)
+                return week, 0.0, size
+
+            # Another process is refreshing the week
+            if stored is not None:
+                return stored[0], stored[1], 0
+            deadline = time.monotonic() + self.LEASE_TIME
+            while time.monotonic() < deadline:
+                time.sleep(self.POLL_INTERVAL)
+                stored = self.read(mensa)
+                if stored is not None and stored[1] < self.ttl:
+                    return stored[0], stored[1], 0
+        except sqlite3.Error:
+            pass
+
+        week, size = download(mensa)
+        return week, 0.0, size
+
+    # Returns the stored week of the given canteen and its age in seconds, or None if there is none
+    def read(self, mensa: str):
+        with closing(self.connect()) as connection:
+            row = connection.execute("SELECT fetched, week FROM weeks WHERE mensa = ?", (mensa,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return decode_week(row[1]), max(0.0, self.clock() - row[0])
+        except (ValueError, TypeError):
+            return None
+
+    def write(self, mensa: str, week: dict):
+        with closing(self.connect()) as connection:
+            connection.execute("INSERT OR REPLACE INTO weeks VALUES (?, ?, ?)",
+                               (mensa, self.clock(), encode_week(week)))
+
+    # Tries to become the process that refreshes the week of the given canteen
+    # Returns False if another process holds an unexpired lease
+    def acquire_lease(self, mensa: str) -> bool:
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT expires FROM leases WHERE mensa = ?", (mensa,)).fetchone()
+            if row is not None and row[0] > self.clock():
+                connection.execute("ROLLBACK")
+                return False
+            connection.execute("INSERT OR REPLACE INTO leases VALUES (?, ?)",
+                               (mensa, self.clock() + self.LEASE_TIME))
+            connection.execute("COMMIT")
+            return True
+        finally:
+            connection.close()
+
+    # Stores a refreshed week and releases the lease for its canteen
+    # If the week can't be stored, the other processes will download it themselves
+    def store(self, mensa: str, week: dict):
+        try:
+            self.write(mensa, week)
+        except sqlite3.Error:
+            pass
+        self.release_lease(mensa)
+
+    # Releases the lease for the given canteen, failures are ignored (the lease expires on its own)
+    def release_lease(self, mensa: str):
+        try:
+            with closing(self.connect()) as connection:
+                connection.execute("DELETE FROM leases WHERE mensa = ?", (mensa,))
+        except sqlite3.Error:
+            pass
+
+
+# Makes the database at the given path and its -wal and -shm files readable and writable by all users,
+# so that every instance on the host can use them. Only the owner of a file may change its permissions,
+# so the files created by other users are left as they are (they share them themselves)
+def share_files(path: str):
+    if not hasattr(os, "getuid"):  # Not available on Windows
+        return
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            status = os.stat(path + suffix)
+            if status.st_mode & 0o666 != 0o666 and status.st_uid == os.getuid():
+                os.chmod(path + suffix, status.st_mode | 0o666)
+        except OSError:
+            pass
+
+
+# Serializes a week to JSON (the dates become lists, since JSON has no tuples)
+def encode_week(week: dict) -> str:
+    return json.dumps([[list(date), [list(row) for row in menu]] for date, menu in week.items()])
+
+
+# Deserializes a week serialized by encode_week, removing control characters from the texts
+def decode_week(data: str) -> CompactWeek:
+    return CompactWeek((tuple(int(i) for i in date), [[printable(category), printable(dish), int(price)]
+                                                      for category, dish, price in menu])
+                       for date, menu in json.loads(data))
+
+
+def printable(text: str) -> str:
+    return ''.join(char for char in str(text) if char.isprintable())
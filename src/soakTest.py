@@ -0,0 +1,305 @@
+import gc
+import os
+import sys
+import time
+import random
+import statistics
+import asyncio
+import argparse
+import tracemalloc
+
+import stw_parser
+from grid import Grid
+from menuGrid import MenuGrid
+from compactWeek import CompactWeek
+from fakeTerminal import FakeTerminal
+from outputProfile import OutputProfile
+from application import Application, read_keys
+from perfCounters import counters
+from ui import build_ui, init_menu_grid, screen
+from stw_parser import (add_week_listener, remove_week_listener, set_clock, set_shared_cache,
+                        get_available_days, get_menu)
+from sessionReplayer import load, recorded_week, install_weeks, create_application
+
+
+# This file contains a soak test: it runs the application headless for hours of simulated time
+# against the menus of a recorded session (see sessionRecorder.py) and checks that neither
+# the memory usage nor the frame time grows over time
+# Every step of the simulation is one animation tick (see Application.ANIMATION_INTERVAL):
+# the widgets are updated like in a real session, and a frame is rendered every few ticks
+# (rendering every tick would make hours of simulated time take hours). In between,
+# the simulated user switches tabs, opens the week view, the performance HUD and the search,
+# and resizes the terminal at random
+# The menu cache runs on the simulated clock (see stw_parser.set_clock) and downloads return the recorded
+# menus (see recorded_download), so outdated menus are revalidated in the background, the footer shows
+# their age and menus older than the maximal staleness are downloaded again, like in a real session
+# With --shared-cache, the menus pass through a shared cache (see sharedCache.py) on the simulated clock too
+# The memory is sampled every few simulated minutes (RSS, and the memory allocated by Python
+# if tracemalloc is used). The growth is measured from the first sample after the warm-up
+# The frame times of the session depend on the random views (e.g. the week view takes longer than
+# a menu), so the frame time is measured with a fixed reference view at every sample instead:
+# the UI with the first recorded menu at the recorded size (see build_reference).
+# Its median render time in the second half of the samples after the warm-up is compared
+# with the one in the first half (single samples vary too much to be compared)
+
+# Number of renders of the reference view per sample, the fastest one counts
+REFERENCE_RENDERS = 10
+
+# Terminal sizes the simulated user resizes to
+SIZES = [(80, 24), (100, 30), (120, 40), (160, 50), (60, 20)]
+
+# The random actions of the simulated user with their weights
+ACTIONS = {
+    "KEY_LEFT": 10,
+    "KEY_RIGHT": 10,
+    "KEY_UP": 15,
+    "KEY_DOWN": 15,
+    "w": 1,
+    "p": 1,
+    "search": 1,
+    "resize": 1
+}
+
+# Words typed into the search
+SEARCH_WORDS = ["schnitzel", "vegan", "pommes", "reis", "gemuse", "pasta", "curry", "x"]
+
+
+# Simulated seconds since the start of the soak test
+simulated_time = 0.0
+
+# time.time() at the start, the simulated clock starts from it so that the shared cache can use it
+START_TIME = time.time()
+
+# The canteens (raw names) downloaded during the soak test, see recorded_download
+downloads = []
+
+
+# Returns the simulated time in seconds since the epoch
+def simulated_clock() -> float:
+    return START_TIME + simulated_time
+
+
+# Returns a replacement for stw_parser.download_week that returns the recorded week of a canteen
+# instead of downloading it (every day is passed to on_day, as if it was parsed while downloading)
+def recorded_download(recording: dict):
+    def download_week(mensa: str, on_day=None) -> tuple[dict, int]:
+        downloads.append(mensa)
+        week = recorded_week(recording, mensa)
+        if on_day is not None:
+            for date, menu in week.items():
+                on_day(date, menu)
+        return CompactWeek(week), 0
+
+    return download_week
+
+
+# Builds the reference view: the UI with the menu of the first recorded day of the default canteen
+# at the recorded terminal size, it isn't changed during the soak test
+# Returns its main grid and terminal
+def build_reference(recording: dict) -> tuple[Grid, OutputProfile]:
+    term = OutputProfile(FakeTerminal(recording["width"], recording["height"]), OutputProfile.TRUECOLOR)
+    days = get_available_days()
+    main_grid = build_ui(term, days)
+    menu_grid = MenuGrid(0, 0)
+    init_menu_grid(menu_grid, get_menu("academica", *days[0]))
+    main_grid.get_by_label("body").set_cell(1, 1, menu_grid)
+    return main_grid, term
+
+
+# Returns the shortest render time of the reference view (see build_reference) in seconds
+def time_reference(reference: tuple[Grid, OutputProfile]) -> float:
+    main_grid, term = reference
+    times = []
+    for render in range(REFERENCE_RENDERS):
+        start = time.perf_counter()
+        screen(main_grid, term)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+# Performs one random action of the simulated user
+def act(application: Application, rng: random.Random):
+    action = rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+    term = application.term
+    if action == "resize":
+        term.set_size(*rng.choice(SIZES))
+        return
+    if action == "search":
+        keys = ['/'] + list(rng.choice(SEARCH_WORDS)) + ["KEY_BACKSPACE"] * rng.randint(0, 3) + ["KEY_ESCAPE"]
+    else:
+        keys = [action]
+    for key in keys:
+        term.push_key(key)
+    application.handle_keys(read_keys(term, 0))
+
+
+# Returns the memory usage of the process (RSS) and the memory allocated by Python
+# (0 if tracemalloc isn't used), both in bytes, after a full garbage collection
+def sample_memory() -> tuple[int, int]:
+    gc.collect()
+    counters.memory = None
+    traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    return counters.memory_usage() or 0, traced
+
+
+# Runs the simulation for the given number of simulated seconds
+# frame_rate is the number of rendered frames per simulated second
+# Returns the samples: [(simulated seconds, RSS, traced bytes, mean frame time, maximal frame time,
+# render time of the reference view)] and the tracemalloc snapshots after the warm-up and at the end
+# (None if tracemalloc isn't used)
+async def soak(application: Application, reference: tuple[Grid, OutputProfile], duration: float,
+               sample_interval: float, warmup: float, action_rate: float, frame_rate: float, seed: int):
+    global simulated_time
+    rng = random.Random(seed)
+    application.SETTLE_DELAY = 0
+    steps = int(duration / application.ANIMATION_INTERVAL)
+    sample_steps = max(1, int(sample_interval / application.ANIMATION_INTERVAL))
+    frame_steps = max(1, round(1 / (frame_rate * application.ANIMATION_INTERVAL)))
+
+    samples = []
+    snapshots = [None, None]
+    frame_times = []
+    for step in range(1, steps + 1):
+        simulated_time = step * application.ANIMATION_INTERVAL
+        if rng.random() < action_rate * application.ANIMATION_INTERVAL:
+            act(application, rng)
+        # Fetches, revalidations and prefetches finish within the tick (the downloads take no time)
+        tasks = [application.fetch_task, application.weeks_task,
+                 *application.repository.refreshes.values(), *application.prefetcher.tasks.values()]
+        tasks = [task for task in tasks if task is not None and not task.done()]
+        if len(tasks) != 0:
+            await asyncio.wait(tasks)
+
+        application.update()
+        if step % frame_steps == 0:
+            start = time.perf_counter()
+            application.render()
+            frame_times.append(time.perf_counter() - start)
+
+        if step % sample_steps == 0:
+            elapsed = step * application.ANIMATION_INTERVAL
+            rss, traced = sample_memory()
+            samples.append((elapsed, rss, traced, sum(frame_times) / max(1, len(frame_times)),
+                            max(frame_times, default=0.0), time_reference(reference)))
+            report(samples[-1])
+            frame_times = []
+            if tracemalloc.is_tracing() and snapshots[0] is None and elapsed >= warmup:
+                snapshots[0] = tracemalloc.take_snapshot()
+
+    if tracemalloc.is_tracing():
+        snapshots[1] = tracemalloc.take_snapshot()
+    application.executor.shutdown()
+    return samples, snapshots
+
+
+# Prints one line of the samples table
+def report(sample: tuple):
+    elapsed, rss, traced, mean_time, max_time, reference_time = sample
+    print(f"{elapsed / 60:>8.0f} min"
+          f"{rss / (1 << 20):>10.1f} MiB RSS"
+          f"{traced / (1 << 20):>10.2f} MiB traced"
+          f"{mean_time * 1000:>10.3f} ms/frame"
+          f"{max_time * 1000:>10.3f} ms max"
+          f"{reference_time * 1000:>10.3f} ms reference")
+
+
+# Checks the samples against the ceilings, the warm-up samples are ignored
+# Also checks that outdated menus were downloaded again if the session was long enough for them to expire
+# Returns the list of violated ceilings
+def check(samples: list[tuple], warmup: float, max_growth: float, max_rss: float, frame_tolerance: float) -> list[str]:
+    measured = [sample for sample in samples if sample[0] >= warmup]
+    if len(measured) < 2:
+        return ["too few samples after the warm-up, run longer or sample more often"]
+
+    failures = []
+    first, last = measured[0], measured[-1]
+    # The memory allocated by Python is more precise, RSS is used if it isn't traced
+    growth = last[2] - first[2] if last[2] != 0 else last[1] - first[1]
+    if growth > max_growth:
+        failures.append(f"memory grew by {growth / (1 << 20):.2f} MiB (ceiling: {max_growth / (1 << 20):.2f} MiB)")
+    peak = max(sample[1] for sample in samples)
+    if max_rss > 0 and peak > max_rss:
+        failures.append(f"RSS reached {peak / (1 << 20):.1f} MiB (ceiling: {max_rss / (1 << 20):.1f} MiB)")
+    half = len(measured) // 2
+    before = statistics.median(sample[5] for sample in measured[:half])
+    after = statistics.median(sample[5] for sample in measured[half:])
+    if after > before * (1 + frame_tolerance):
+        failures.append(f"the render time of the reference view grew from {before * 1000:.3f} ms "
+                        f"to {after * 1000:.3f} ms (tolerance: {frame_tolerance * 100:.0f}%)")
+    if samples[-1][0] > stw_parser.CACHE_TTL and len(downloads) == 0:
+        failures.append("no outdated menu was downloaded again")
+    return failures
+
+
+# Prints the allocation sites whose memory grew the most between the two snapshots
+def report_growth(snapshots: list, count=10):
+    if None in snapshots:
+        return
+    print()
+    print("Largest growth since the warm-up:")
+    for statistic in snapshots[1].compare_to(snapshots[0], "lineno")[:count]:
+        print(f"  {statistic}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soak test for long sessions of the Mensa TUI")
+    parser.add_argument("recording", metavar="RECORDING",
+                        help="a session recorded with \"python main.py --record FILE\", only its menus "
+                             "and terminal size are used")
+    parser.add_argument("--hours", type=float, default=1.0,
+                        help="simulated duration of the session in hours")
+    parser.add_argument("--sample-minutes", type=float, default=5.0,
+                        help="simulated minutes between two memory samples")
+    parser.add_argument("--warmup-minutes", type=float, default=10.0,
+                        help="simulated minutes before the memory and frame time are measured")
+    parser.add_argument("--actions-per-minute", type=float, default=30.0,
+                        help="mean number of actions (keys, resizes) per simulated minute")
+    parser.add_argument("--frames-per-second", type=float, default=1.0,
+                        help="rendered frames per simulated second (at most 20, like the application)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the random actions")
+    parser.add_argument("--max-growth", metavar="MIB", type=float, default=4.0,
+                        help="maximal memory growth after the warm-up")
+    parser.add_argument("--max-rss", metavar="MIB", type=float, default=0.0,
+                        help="maximal memory usage of the process (unlimited by default)")
+    parser.add_argument("--frame-tolerance", type=float, default=0.5,
+                        help="relative growth of the render time of the reference view that counts as a failure")
+    parser.add_argument("--shared-cache", metavar="FILE",
+                        help="passes the menus through a shared cache in the given database "
+                             "(see \"python main.py --shared-cache\")")
+    parser.add_argument("--no-tracemalloc", action="store_true",
+                        help="only measures RSS, which is less precise but doesn't slow the program down")
+    arguments = parser.parse_args()
+
+    if not arguments.no_tracemalloc:
+        tracemalloc.start()
+    recording = load(arguments.recording)
+    set_clock(simulated_clock)
+    stw_parser.download_week = recorded_download(recording)
+    if arguments.shared_cache:
+        set_shared_cache(arguments.shared_cache, simulated_clock)
+    install_weeks(recording)
+    with open(os.devnull, 'w') as devnull:
+        application = create_application(recording, devnull)
+        reference = build_reference(recording)
+        # The search index is kept up to date like in Application.run_async
+        add_week_listener(application.search_index.add_week)
+        try:
+            samples, snapshots = asyncio.run(soak(
+                application, reference, arguments.hours * 60 * 60, arguments.sample_minutes * 60,
+                arguments.warmup_minutes * 60, arguments.actions_per_minute / 60, arguments.frames_per_second,
+                arguments.seed))
+        finally:
+            remove_week_listener(application.search_index.add_week)
+
+    print()
+    print(f"Downloaded {len(downloads)} menus again")
+    failures = check(samples, arguments.warmup_minutes * 60, arguments.max_growth * (1 << 20),
+                     arguments.max_rss * (1 << 20), arguments.frame_tolerance)
+    if len(failures) != 0:
+        report_growth(snapshots)
+        print()
+        print("Failed: " + "; ".join(failures))
+        sys.exit(1)
+    print()
+    print("Passed")
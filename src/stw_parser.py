@@ -1,6 +1,17 @@
 from bs4 import BeautifulSoup
 import requests
 import datetime
+import time
+import threading
+import codecs
+from concurrent.futures import ThreadPoolExecutor
+
+from perfCounters import counters
+from sharedCache import SharedCache
+from accordionParser import AccordionParser
+from compactMenu import CompactMenu
+from compactWeek import CompactWeek
+from tracing import span
 
 
 # This file contains all functions that fetch the data from the STW Aachen website
@@ -31,6 +42,41 @@ FORMATTED_TO_RAW_MENSA = {
     "Jülich":               "juelich"
 }
 
+# The number of seconds a download may take before it is aborted
+REQUEST_TIMEOUT = 10
+
+# The exceptions raised when a page can't be downloaded or parsed
+FETCH_ERRORS = (requests.RequestException, AttributeError, IndexError)
+
+# The size of the chunks a page is downloaded in, in bytes
+CHUNK_SIZE = 16 * 1024
+
+# The number of seconds a downloaded weekly menu page is reused for
+CACHE_TTL = 15 * 60
+
+# The clock the age of the cached weeks is measured with, see set_clock
+_clock = time.monotonic
+
+# {raw canteen name: (_clock() value of the download, parse_week output)}
+_week_cache = dict()
+
+# {raw canteen name: threading.Lock}, see week_lock
+_week_locks = dict()
+
+# SharedCache, the cache shared with other processes (None if not used), see set_shared_cache
+_shared_cache = None
+
+# ParsePool, the worker processes pages are parsed in (None if they are parsed in this process),
+# see set_parse_pool
+_parse_pool = None
+
+# {raw canteen name: [(day, month, year)]}, the days with a menu of every cached week, see get_known_days
+_available_days = dict()
+
+# [function(str, dict)], called with the raw canteen name and the week
+# whenever a week is put into the cache, see add_week_listener
+_week_listeners = []
+
 
 # See above
 def formatted_mensa(raw_name: str) -> str:
@@ -60,46 +106,111 @@ def raw_date(s: str) -> (int, int, int):
         return today.day, today.month, today.year
 
 
-# Output format: [(day, month, year)]
-def get_available_days(mensa="academica") -> list[tuple[int, int, int]]:
-    request = requests.get(f"https://www.studierendenwerk-aachen.de/speiseplaene/{mensa}-w.html")
-    request.encoding = "utf-8"
-    request = request.text
-    soup = BeautifulSoup(request, 'html.parser')
-    soup = soup.body.find(class_="accordion")
-    return [raw_date(elem.h3.a.text.split(', ')[1]) for elem in soup.contents]
+# Returns the address of the weekly menu page of the given canteen
+def page_url(mensa: str) -> str:
+    return f"https://www.studierendenwerk-aachen.de/speiseplaene/{mensa}-w.html"
 
 
-# Returns the menu for the given canteen and date
-# in the format [(dish category, dish name, price in cents]
-def get_menu(mensa="academica", day=0, month=0, year=0) -> list[str, str, int]:
-    if day == 0 or month == 0 or year == 0:
-        today = datetime.date.today()
-        day = today.day
-        month = today.month
-        year = today.year
+# Downloads the weekly menu page of the given canteen
+# The page is returned in chunks of bytes as they arrive, so it can be parsed while downloading
+# Only the time spent waiting for the chunks is recorded as the fetch time
+def fetch_page(mensa: str):
+    fetch_time = 0.0
+    with requests.get(page_url(mensa), timeout=REQUEST_TIMEOUT, stream=True) as response:
+        chunks = response.iter_content(CHUNK_SIZE)
+        while True:
+            start = time.perf_counter()
+            with span("fetch", mensa=mensa):
+                chunk = next(chunks, None)
+            fetch_time += time.perf_counter() - start
+            counters.record_fetch(fetch_time)
+            if chunk is None:
+                return
+            yield chunk
+
 
-    request = requests.get(f"https://www.studierendenwerk-aachen.de/speiseplaene/{mensa}-w.html")
-    request.encoding = "utf-8"
-    request = request.text
-    soup = BeautifulSoup(request, 'html.parser')
-    soup = soup.body.find(class_="accordion")
-    dayMenu = [elem for elem
-               in soup.contents
-               if elem.h3.a.text.split(', ')[1] == formatted_date(day, month, year)]
+# Downloads the weekly menu page of the given canteen unless it didn't change since an earlier download
+# validators - dict, the "ETag" and "Last-Modified" headers of the earlier download (empty if there was none)
+# Returns the page (None if it didn't change) and the validators of the page
+def fetch_page_if_modified(mensa: str, validators: dict) -> tuple[bytes, dict]:
+    headers = dict()
+    if "ETag" in validators:
+        headers["If-None-Match"] = validators["ETag"]
+    if "Last-Modified" in validators:
+        headers["If-Modified-Since"] = validators["Last-Modified"]
 
-    if len(dayMenu) == 0:
-        return []
+    start = time.perf_counter()
+    with span("fetch", mensa=mensa, conditional=True):
+        response = requests.get(page_url(mensa), headers=headers, timeout=REQUEST_TIMEOUT)
+    counters.record_fetch(time.perf_counter() - start)
+    if response.status_code == 304:
+        return None, validators
+    response.raise_for_status()
+    return response.content, {name: response.headers[name] for name in ("ETag", "Last-Modified")
+                              if name in response.headers}
 
-    dayMenu = dayMenu[0].div
-    side_dishes = [i for i in
-                   dayMenu.find(class_="extras").find(string="Hauptbeilagen").parent.parent.contents[1].contents
-                   if i.name is None]
-    side_dishes += [i for i in
-                    dayMenu.find(class_="extras").find(string="Nebenbeilage").parent.parent.contents[1].contents
-                    if i.name is None]
 
-    dayMenu = dayMenu.find(class_="menues").tbody.contents
+# Extracts the menus of all days from a weekly menu page given in chunks of bytes (see fetch_page)
+# Output format: {(day, month, year): [[dish category, dish name, price in cents]]}
+# (a CompactWeek of CompactMenus, see compactWeek.py and compactMenu.py)
+# The days are in the same order as on the page
+# The page is parsed incrementally (see accordionParser.py): on_day(date, menu) is called
+# for every day as soon as its part of the page has arrived, and the rest of the page
+# after the menus isn't read at all
+def parse_week(chunks, on_day=None) -> CompactWeek:
+    week = CompactWeek()
+
+    def on_item(html: str):
+        with span("extract"):
+            date, menu = parse_day_html(html)
+        week[date] = menu
+        if on_day is not None:
+            on_day(date, menu)
+
+    parser = AccordionParser(on_item)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parse_time = 0.0
+    for chunk in chunks:
+        start = time.perf_counter()
+        with span("parse", bytes=len(chunk)):
+            parser.feed(decoder.decode(chunk))
+        parse_time += time.perf_counter() - start
+        if parser.finished:
+            break
+    parser.close()
+    counters.record_parse(parse_time)
+
+    # Like an unexpected page structure, a page without menus raises an AttributeError
+    if not parser.found():
+        raise AttributeError("The page contains no menus")
+    return week
+
+
+# Extracts the date and the menu from the HTML of the part of a weekly menu page that belongs to one day
+# Output format: (day, month, year), see parse_day
+def parse_day_html(html: str) -> tuple[tuple[int, int, int], list[str, str, int]]:
+    elem = BeautifulSoup(html, 'html.parser').find()
+    return raw_date(elem.h3.a.text.split(', ')[1]), parse_day(elem.div)
+
+
+# Extracts the menu from the part of a weekly menu page that belongs to one day
+# Output format: [[dish category, dish name, price in cents]] (as a CompactMenu)
+def parse_day(dayMenu) -> CompactMenu:
+    # Days without side dishes (e.g. when a canteen is closed) don't have all sections
+    try:
+        side_dishes = [i for i in
+                       dayMenu.find(class_="extras").find(string="Hauptbeilagen").parent.parent.contents[1].contents
+                       if i.name is None]
+        side_dishes += [i for i in
+                        dayMenu.find(class_="extras").find(string="Nebenbeilage").parent.parent.contents[1].contents
+                        if i.name is None]
+    except AttributeError:
+        side_dishes = []
+
+    try:
+        dayMenu = dayMenu.find(class_="menues").tbody.contents
+    except AttributeError:
+        dayMenu = []
 
     dishes = []
     for item in dayMenu:
@@ -118,7 +229,204 @@ def get_menu(mensa="academica", day=0, month=0, year=0) -> list[str, str, int]:
         dishes.append([category, dish, price])
 
     for side_dish in side_dishes: dishes.append(['Beilage', side_dish, 0])
-    return dishes
+    return CompactMenu(dishes)
+
+
+# Returns the menus of all days of the current week for the given canteen
+# (see parse_week for the format)
+# Weekly pages are cached for CACHE_TTL seconds, since switching between days
+# and canteens would otherwise download the same pages over and over again
+# Concurrent calls for the same canteen download the page only once
+# If the page is downloaded, on_day(date, menu) is called for every day as soon as it is parsed
+def get_week(mensa="academica", on_day=None) -> dict[tuple[int, int, int], list[str, str, int]]:
+    with week_lock(mensa):
+        week = cached_week(mensa)
+        counters.record_cache(week is not None)
+        if week is None:
+            load_week(mensa, on_day)
+            week = _week_cache[mensa][1]
+    return week
+
+
+# Returns the cached week of the given canteen or None if it isn't cached or is outdated
+def cached_week(mensa: str):
+    if mensa in _week_cache:
+        fetched, week = _week_cache[mensa]
+        if _clock() - fetched < CACHE_TTL:
+            return week
+    return None
+
+
+# Returns the cached week of the given canteen, also if it is outdated, and its age in seconds
+# Returns None if the week of the canteen was never downloaded
+def stored_week(mensa: str):
+    if mensa not in _week_cache:
+        return None
+    fetched, week = _week_cache[mensa]
+    return week, _clock() - fetched
+
+
+# Returns all cached weeks, also the outdated ones
+# Output format: {raw canteen name: (_clock() value of the download, get_week output)}
+def cached_weeks() -> dict[str, tuple[float, dict]]:
+    return dict(_week_cache)
+
+
+# Puts the given week of the given canteen into the cache, as if it was downloaded just now
+# (used for replaying recorded sessions, see sessionReplayer.py)
+def store_week(mensa: str, week: dict[tuple[int, int, int], list[str, str, int]]):
+    put_week(mensa, _clock(), CompactWeek(week))
+
+
+# Puts the given week into the cache with the given _clock() value of its download,
+# updates the available days of the canteen and passes the week to the week listeners
+def put_week(mensa: str, fetched: float, week: dict[tuple[int, int, int], list[str, str, int]]):
+    _week_cache[mensa] = (fetched, week)
+    _available_days[mensa] = available_days(week)
+    for listener in list(_week_listeners):
+        listener(mensa, week)
+
+
+# Makes listener(raw canteen name, week) be called for every week put into the cache
+# Weeks are usually downloaded in a thread pool, so the listener is called from its threads
+def add_week_listener(listener):
+    _week_listeners.append(listener)
+
+
+def remove_week_listener(listener):
+    if listener in _week_listeners:
+        _week_listeners.remove(listener)
+
+
+# Puts the week of the given canteen into the cache, taking it from the shared cache
+# if there is one (see set_shared_cache), downloading and parsing it otherwise
+# on_day is called for every downloaded day as soon as it is parsed (see parse_week)
+# Returns the number of downloaded bytes
+def load_week(mensa: str, on_day=None) -> int:
+    if _shared_cache is None:
+        week, size = download_week(mensa, on_day)
+        put_week(mensa, _clock(), week)
+        return size
+
+    # A week from the shared cache is only kept for the rest of its lifetime
+    week, age, size = _shared_cache.get_week(mensa, lambda mensa: download_week(mensa, on_day))
+    put_week(mensa, _clock() - age, week)
+    return size
+
+
+# Downloads and parses the weekly page of the given canteen
+# With a parse pool (see set_parse_pool), a page nobody waits for (on_day is None, e.g. in get_all_weeks
+# or prefetch_week) is parsed in a worker process after it was downloaded completely.
+# Pages with on_day are parsed here while they are downloaded, so their first days are shown early
+# Returns the week (see parse_week) and the number of downloaded bytes
+def download_week(mensa: str, on_day=None) -> tuple[dict, int]:
+    size = 0
+
+    def count(chunks):
+        nonlocal size
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+
+    if _parse_pool is None or on_day is not None:
+        return parse_week(count(fetch_page(mensa)), on_day), size
+
+    page = b''.join(count(fetch_page(mensa)))
+    start = time.perf_counter()
+    with span("parse", bytes=size, pool=True):
+        week = _parse_pool.parse(mensa, page)
+    counters.record_parse(time.perf_counter() - start)
+    return week, size
+
+
+# Makes all processes using the database at the given path share their downloaded weeks
+# (see sharedCache.py), clock returns the current time in seconds since the epoch (see SharedCache.clock)
+def set_shared_cache(path: str, clock=time.time):
+    global _shared_cache
+    _shared_cache = SharedCache(path, CACHE_TTL, clock)
+
+
+# Makes the age of the cached weeks be measured with the given clock (a function returning seconds)
+# instead of time.monotonic, e.g. with the simulated time of a soak test (see soakTest.py)
+def set_clock(clock):
+    global _clock
+    _clock = clock
+
+
+# Makes the downloaded pages be parsed in the worker processes of the given ParsePool (see parsePool.py)
+# or in this process again if pool is None
+# Only bulk downloads use it (see download_week), e.g. the weeks of all canteens the TUI downloads
+# with "python main.py --parse-workers N"
+def set_parse_pool(pool):
+    global _parse_pool
+    _parse_pool = pool
+
+
+# Returns the lock that serialises downloads of the given canteen's page
+def week_lock(mensa: str) -> threading.Lock:
+    return _week_locks.setdefault(mensa, threading.Lock())
+
+
+# Puts the week of the given canteen into the cache, unless it is already there
+# Used for prefetching: failures are ignored, and the cache statistics are not affected
+# Returns the number of downloaded bytes
+def prefetch_week(mensa: str) -> int:
+    with week_lock(mensa):
+        if cached_week(mensa) is not None:
+            return 0
+        try:
+            return load_week(mensa)
+        except FETCH_ERRORS:
+            return 0
+
+
+# Returns the menus of the current week for several canteens (all canteens by default)
+# The weekly pages are fetched concurrently
+# Canteens whose page can't be fetched or parsed are given an empty week
+# Output format: {raw canteen name: get_week output}
+def get_all_weeks(mensas=None) -> dict[str, dict[tuple[int, int, int], list[str, str, int]]]:
+    mensas = list(RAW_TO_FORMATTED_MENSA) if mensas is None else mensas
+    with ThreadPoolExecutor(max_workers=max(1, len(mensas))) as executor:
+        return dict(zip(mensas, executor.map(get_week_or_empty, mensas)))
+
+
+# Same as get_week, but returns an empty week if the page can't be fetched or parsed
+def get_week_or_empty(mensa: str) -> dict[tuple[int, int, int], list[str, str, int]]:
+    try:
+        return get_week(mensa)
+    except FETCH_ERRORS:
+        return CompactWeek()
+
+
+# Returns the days for which the given canteen has a menu (closed days are left out)
+# Output format: [(day, month, year)]
+def get_available_days(mensa="academica") -> list[tuple[int, int, int]]:
+    get_week(mensa)
+    return get_known_days(mensa)
+
+
+# Returns the days with a menu of the given canteen from its last known week without downloading it
+# (None if the week of the canteen was never downloaded)
+def get_known_days(mensa: str):
+    days = _available_days.get(mensa)
+    return None if days is None else list(days)
+
+
+# Returns the days with a menu of the given week, in the order of the week
+def available_days(week: dict[tuple[int, int, int], list[str, str, int]]) -> list[tuple[int, int, int]]:
+    return [date for date, menu in week.items() if len(menu) != 0]
+
+
+# Returns the menu for the given canteen and date
+# in the format [(dish category, dish name, price in cents]
+def get_menu(mensa="academica", day=0, month=0, year=0) -> list[str, str, int]:
+    if day == 0 or month == 0 or year == 0:
+        today = datetime.date.today()
+        day = today.day
+        month = today.month
+        year = today.year
+
+    return get_week(mensa).get((day, month, year), [])
 
 
 # Used for testing, is run only when run as a standalone file
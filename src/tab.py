@@ -38,9 +38,6 @@ class Tab(TextLine):
             return out + ' '
 
         # Scrolling, as in TextLine, is only activated if the widget is active
-        if len(self.text) > self.width and self.active:
-            return out + self.get_text_char((x + self.offset) % (len(self.text) + 1))
-        # The standard case without scrolling
         return out + self.get_text_char(x)
 
     # Setter for self.opened
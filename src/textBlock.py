@@ -0,0 +1,49 @@
+from widget import Widget
+from textLayout import TextLayout
+from blessed import Terminal
+
+
+# TextBlock is a class that represents a multi-line text label
+# Every line is displayed in its own row, starting from the top-left corner
+# Lines that don't fit into the widget are cut off (unlike TextLine, there is no scrolling)
+# Widths are measured in terminal cells, not in characters (see textLayout.py)
+# Attributes:
+# - self.lines - [str], the displayed lines
+# - self.layouts - [TextLayout], the cells of the lines
+# Parameters:
+# - active_background - (int, int, int), the background color when the widget is active
+# - inactive_background - (int, int, int), the background color when the widget is inactive
+# - active_text - (int, int, int), the foreground color when the widget is active
+# - inactive_text - (int, int, int), the foreground color when the widget is inactive
+# - cached_layout - bool, determines if the layouts of the lines are cached (see textLayout.layout_cells),
+# - - turned off for lines that change all the time
+class TextBlock(Widget):
+    def __init__(self, width: int, height: int, lines=None):
+        super().__init__(width, height)
+        self.lines = lines or []
+        self.layouts = [TextLayout(line) for line in self.lines]
+        self.parameters["active_text"] = (255, 255, 255)
+        self.parameters["inactive_text"] = (128, 128, 128)
+        self.parameters["active_background"] = (0, 0, 0)
+        self.parameters["inactive_background"] = (0, 0, 0)
+        self.parameters["cached_layout"] = True
+
+    # Setter for self.lines
+    def set_lines(self, lines: list[str]):
+        self.lines = lines
+        self.layouts = [TextLayout(line, self.parameters["cached_layout"]) for line in lines]
+
+    # Getter for self.lines
+    def get_lines(self) -> list[str]:
+        return self.lines
+
+    # Returns the character that is to be displayed at the coordinates (x, y)
+    # (relative to the top-left corner of the widget)
+    def get_char(self, x: int, y: int, term: Terminal) -> str:
+        # out determines the back- and foreground colors of the cell
+        out = term.on_color_rgb(*self.parameters[("" if self.active else "in") + "active_background"])
+        out += term.color_rgb(*self.parameters[("" if self.active else "in") + "active_text"])
+
+        if 0 <= y < len(self.layouts) and 0 <= x < self.width:
+            return out + self.layouts[y].line(self.width)[x]
+        return out + ' '
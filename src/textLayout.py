@@ -0,0 +1,137 @@
+from functools import lru_cache
+
+from wcwidth import wcwidth
+
+
+# Zero width joiner, joins the graphemes before and after it (e.g. in emoji sequences)
+ZERO_WIDTH_JOINER = '\u200d'
+
+# Emoji presentation selector, makes the grapheme before it two cells wide
+EMOJI_PRESENTATION = '\ufe0f'
+
+# Displayed instead of characters that can't be displayed (e.g. control characters)
+REPLACEMENT = '\ufffd'
+
+
+# TextLayout lays out a single line of text on the cells of a terminal, once per text
+# Terminals don't display one code point per cell: combining characters (e.g. the accent of "é"
+# written as "e" + U+0301) share the cell of the character before them, and wide characters
+# (e.g. CJK characters and most emoji) take two cells. Every grapheme (a character with the
+# characters combined with it) is placed on its cells. The first cell of a wide grapheme holds it,
+# the second one holds "" (see ui.screen: a cell without text is covered by the cell before it)
+# The cells of the recently laid out texts are cached (see layout_cells), since menus repeat
+# their texts (e.g. the categories) and a menu grid lays out every text of a menu at once
+# Texts that change all the time (e.g. the performance HUD) are laid out without the cache
+# (cached=False), so they don't push the texts of the menus and tabs out of it
+# For scrolling text (see TextLine), the text followed by a blank cell is laid out twice
+# in a ring buffer, so every position of the marquee is a plain slice of it
+# The cells last returned by line and marquee are kept, since they are requested for every cell
+# of a widget in every frame and only change when it scrolls or is resized
+# Attributes:
+# - self.text - str, the laid out text
+# - self.cells - (str), the text of every cell
+# - self.width - int, the number of cells of the text
+# - self.ring - (str), the marquee: self.cells and a blank cell, twice (None until it is needed)
+# - self.window - (int, int, [str]), the offset, the width and the cells of the last line or marquee
+# - - (the offset is -1 for a line)
+class TextLayout:
+    def __init__(self, text: str, cached=True):
+        self.text = text
+        self.cells = layout_cells(text) if cached else lay_out(text)
+        self.width = len(self.cells)
+        self.ring = None
+        self.window = None
+
+    # Returns the cells of the text cut off or padded with spaces to the given width
+    def line(self, width: int) -> list[str]:
+        if self.window is None or self.window[:2] != (-1, width):
+            self.window = (-1, width, clip(list(self.cells[:width]) + [' '] * (width - self.width)))
+        return self.window[2]
+
+    # Returns the cells of the marquee (the text followed by a blank cell, repeated endlessly)
+    # scrolled by the given number of cells (0 to self.width) in a window of the given width
+    # The width may not be larger than self.width + 1
+    def marquee(self, offset: int, width: int) -> list[str]:
+        if self.window is None or self.window[:2] != (offset, width):
+            if self.ring is None:
+                self.ring = (self.cells + (' ',)) * 2
+            self.window = (offset, width, clip(list(self.ring[offset:offset + width])))
+        return self.window[2]
+
+
+# Returns the number of cells the text takes
+def text_width(text: str) -> int:
+    return len(layout_cells(text))
+
+
+# Returns the text cut off with "…" if it takes more than width cells
+def shorten(text: str, width: int) -> str:
+    cells = layout_cells(text)
+    if len(cells) <= width:
+        return text
+    return ''.join(clip(list(cells[:width - 1]))) + "…"
+
+
+# Returns the text of every cell of the text (see TextLayout), cached
+# Only for texts that are displayed again and again, like the texts of menus and tabs
+@lru_cache(maxsize=4096)
+def layout_cells(text: str) -> tuple[str, ...]:
+    return lay_out(text)
+
+
+# Returns the text of every cell of the text (see TextLayout)
+def lay_out(text: str) -> tuple[str, ...]:
+    # Most texts take one cell per character (e.g. all printable ASCII texts)
+    if text.isascii() and text.isprintable() or set(map(char_width, text)) <= {1}:
+        return tuple(text)
+
+    cells = []
+    for grapheme in graphemes(text):
+        width = grapheme_width(grapheme)
+        # Characters that can't be displayed are replaced,
+        # a combining character at the start of the text is combined with a space
+        if width <= 0:
+            grapheme, width = (REPLACEMENT if width < 0 else ' ' + grapheme), 1
+        cells.append(grapheme)
+        cells.extend([""] * (width - 1))
+    return tuple(cells)
+
+
+# Replaces the halves of wide graphemes cut off at the borders of the given cells by spaces
+def clip(cells: list[str]) -> list[str]:
+    if len(cells) != 0 and cells[0] == "":
+        cells[0] = ' '
+    if len(cells) != 0 and grapheme_width(cells[-1]) > 1:
+        cells[-1] = ' '
+    return cells
+
+
+# Splits the text into graphemes: every character that isn't combined with the character before it
+# starts a new one. Zero width characters (e.g. combining marks) and characters after
+# a zero width joiner are combined
+# (an approximation of the Unicode grapheme clusters that suffices for the texts of menus)
+def graphemes(text: str) -> list[str]:
+    result = []
+    for char in text:
+        if len(result) != 0 and (char_width(char) == 0 or result[-1].endswith(ZERO_WIDTH_JOINER)):
+            result[-1] += char
+        else:
+            result.append(char)
+    return result
+
+
+# Returns the number of cells the grapheme takes (-1 if it can't be displayed)
+def grapheme_width(grapheme: str) -> int:
+    if grapheme == "":
+        return 0
+    width = char_width(grapheme[0])
+    if width >= 0 and EMOJI_PRESENTATION in grapheme:
+        return 2
+    return width
+
+
+# Returns the number of cells the character takes (0 if it is combined with the character before it,
+# -1 if it can't be displayed). Menus use few distinct characters, so the widths are cached
+@lru_cache(maxsize=4096)
+def char_width(char: str) -> int:
+    return wcwidth(char)
@@ -1,12 +1,15 @@
 from widget import Widget
+from textLayout import TextLayout
 from blessed import Terminal
 
 
 # Text line is a class that represents a single-line text label
 # If the widget is taller than one cell, the line is vertically centered
+# Widths and offsets are measured in terminal cells, not in characters (see textLayout.py)
 # Attributes:
 # - self.text - str, the displayed text line
-# - self.offset - int, a number from 0 to len(self.text) inclusively,
+# - self.layout - TextLayout, the cells of self.text
+# - self.offset - int, a number from 0 to self.layout.width inclusively,
 # - - the offset with which the text line is displayed. Used for scrolling text
 # Parameters:
 # - active_background - (int, int, int), the background color when the widget is active
@@ -14,21 +17,28 @@ from blessed import Terminal
 # - active_text - (int, int, int), the foreground color when the widget is active
 # - inactive_text - (int, int, int), the foreground color when the widget is inactive
 # - scrolling - bool, determines if the text should be scrolled if it is longer than self.width
+# - cached_layout - bool, determines if the layout of the text is cached (see textLayout.layout_cells),
+# - - turned off for texts that change all the time
 class TextLine(Widget):
     # Initialises the attributes and the parameters
     def __init__(self, width: int, height: int, text=""):
         super().__init__(width, height)
         self.text = text
+        self.layout = TextLayout(text)
         self.parameters["active_text"] = (255, 255, 255)
         self.parameters["inactive_text"] = (128, 128, 128)
         self.parameters["active_background"] = (0, 0, 0)
         self.parameters["inactive_background"] = (0, 0, 0)
         self.parameters["scrolling"] = True
+        self.parameters["cached_layout"] = True
         self.offset = 0
 
-    # Setter for self.text
+    # Setter for self.text, lays the text out if it changed
     def set_text(self, text: str):
-        self.text = text
+        if text != self.text:
+            self.text = text
+            self.layout = TextLayout(text, self.parameters["cached_layout"])
+            self.offset %= self.layout.width + 1
 
     # Getter for self.text
     def get_text(self) -> str:
@@ -36,17 +46,18 @@ class TextLine(Widget):
 
     # Increments the offset if the text doesn't fit in self.width and should be scrolled
     def update(self):
-        if len(self.text) > self.width and self.parameters["scrolling"]:
-            self.offset = (self.offset + 1) % (len(self.text) + 1)
+        if self.layout.width > self.width and self.parameters["scrolling"]:
+            self.offset = (self.offset + 1) % (self.layout.width + 1)
 
-    # A safe method for getting a character of self.text by index
+    # A safe method for getting the text of a cell of the line
     # Returns a space if the index is out of bounds
+    # Scrolling is taken into account if the text doesn't fit in self.width and the widget is active
     def get_text_char(self, index: int) -> str:
-        try:
-            return (' ' if self.text == "" or index >= len(self.text) or index < 0
-                    else self.text[index])
-        except KeyError:
+        if index < 0 or index >= self.width:
             return ' '
+        if self.layout.width > self.width and self.active:
+            return self.layout.marquee(self.offset, self.width)[index]
+        return self.layout.line(self.width)[index]
 
     # Returns the character that is to be displayed at the coordinates (x, y)
     # (relative to the top-left corner of the widget)
@@ -59,9 +70,4 @@ class TextLine(Widget):
         vertical_center = (self.height - 1) // 2
         if y != vertical_center:
             return out + ' '
-
-        # Scrolling is only activated if the widget is active
-        if len(self.text) > self.width and self.active:
-            return out + self.get_text_char((x + self.offset) % (len(self.text) + 1))
-        # The standard case without scrolling
         return out + self.get_text_char(x)
@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import atexit
+import threading
+from collections import deque
+from contextlib import nullcontext
+
+
+# This file contains opt-in tracing of the main phases of the program
+# (fetching, parsing, updating and rendering)
+# Tracing is enabled by the MENSA_TRACE environment variable or the --trace flag of main.py,
+# both of which give the path of the output file
+# The spans are buffered in memory and written on exit in the Chrome trace event format,
+# which can be opened in chrome://tracing or https://ui.perfetto.dev
+# Only the last MAX_EVENTS spans are kept, so tracing a long session doesn't use more and more memory
+# Usage:
+#     with span("fetch", mensa="academica"):
+#         ...
+
+# Returned by span while tracing is disabled, so that disabled tracing costs one function call
+_DISABLED = nullcontext()
+
+# The number of buffered spans, about half an hour of a session (a frame takes about three spans
+# and up to 20 frames are rendered per second)
+MAX_EVENTS = 100_000
+
+# Buffered events, [(name, start in µs, duration in µs, thread id, args)], the oldest are dropped
+_events = deque(maxlen=MAX_EVENTS)
+
+# The path of the output file or None if tracing is disabled
+_path = None
+
+
+# Span measures the time spent inside its with block and buffers it as an event
+# Attributes:
+# - self.name - str, the name of the span shown in the timeline
+# - self.args - dict, additional data shown for the span
+# - self.start - int, the start time in nanoseconds
+class Span:
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        _events.append((self.name, self.start // 1000, (end - self.start) // 1000,
+                        threading.get_ident(), self.args))
+        return False
+
+
+# Enables tracing, the events are written to the file at path on exit
+def enable(path: str):
+    global _path
+    if _path is None:
+        atexit.register(write)
+    _path = path
+
+
+def enabled() -> bool:
+    return _path is not None
+
+
+# Returns a context manager that measures a span with the given name
+# The keyword arguments are stored with the span
+def span(name: str, **args):
+    if _path is None:
+        return _DISABLED
+    return Span(name, args)
+
+
+# Writes the buffered events to the output file
+def write():
+    if _path is None:
+        return
+
+    pid = os.getpid()
+    events = [{"name": name, "cat": "mensa", "ph": "X", "ts": start, "dur": duration,
+               "pid": pid, "tid": tid, "args": args}
+              for name, start, duration, tid, args in _events]
+    with open(_path, 'w') as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+# Enables tracing if the environment variable is set
+if os.environ.get("MENSA_TRACE"):
+    enable(os.environ["MENSA_TRACE"])
@@ -0,0 +1,282 @@
+import re
+from difflib import SequenceMatcher
+
+from blessed import Terminal
+from widget import Widget
+from grid import Grid
+from menuGrid import MenuGrid
+from verticalTabs import VerticalTabs
+from horizontalTabs import HorizontalTabs
+from textLine import TextLine
+from header import Header
+from weekMatrix import WeekMatrix
+from searchView import SearchView
+from enums import Unit
+from textLayout import text_width, shorten
+from stw_parser import formatted_date, formatted_mensa, FORMATTED_TO_RAW_MENSA
+
+
+# This file contains the functions that build, fill and render the widget tree
+# (see "UI structure" in main.py)
+
+# Displayed in menu_grid if there is no menu for the selected day and canteen
+EMPTY_MENU = [["", "No menu available", 0]]
+
+# Displayed in menu_grid if the menu couldn't be downloaded
+ERROR_MENU = [["Error", "The menu couldn't be downloaded, open it again to retry", 0]]
+
+# Appearance parameters of menu_grid and its cells
+MENU_GRID_PARAMETERS = {
+    "active_background": (0, 0, 255),
+    "inactive_background": (255, 255, 255),
+    "active_text": (255, 255, 255),
+    "inactive_text": (0, 0, 0)
+}
+
+# Appearance parameters of body_grid and its child widgets
+BODY_PARAMETERS = {
+    "active_background": (0, 0, 255),
+    "inactive_background": (96, 96, 96),
+    "opened_background": (255, 255, 255),
+    "active_text": (255, 255, 255),
+    "inactive_text": (255, 255, 255),
+    "opened_text": (0, 0, 0)
+}
+
+# The escape sequences at the start of a character returned by Widget.get_char (see screen)
+STYLE_PATTERN = re.compile(r"(?:\x1b\[[0-9;]*m)*")
+
+# The only tab of day_tabs if a canteen has no menus at all
+NO_DAYS_TEXT = "No menus"
+
+# The text of the footer (see Application.update_footer for the additions)
+# It is short enough for the age of the menu to fit in 80 columns as well
+FOOTER_TEXT = "Q: quit | /: search | W: week view | P: stats"
+
+
+# Builds the widget tree described in "UI structure" in main.py for the given terminal
+# and the list of days with a menu in the opened canteen in the (day, month, year) format
+# Widgets that need to be accessed later are labelled:
+# - main_grid: "header", "body", "footer"
+# - body_grid: "day_tabs", "mensa_tabs", "menu_grid"
+def build_ui(term: Terminal, days: list[tuple[int, int, int]]) -> Grid:
+    # Initialises main_grid, fills the cells with needed widgets
+    # The header and the footer are initialised in-place
+    main_grid = Grid(term.width, term.height)
+    main_grid.set_grid([(1, Unit.CELLS), (100, Unit.PERCENTS), (1, Unit.CELLS)],
+                       [(100, Unit.PERCENTS)])
+    main_grid.set_active(True)
+    main_grid.set_cell(0, 0, Header(0, 0, "Speisepläne - STW Aachen"))
+    main_grid.set_cell(0, 1, Grid(0, 0))
+    main_grid.set_cell(0, 2, Header(0, 0, FOOTER_TEXT))
+    main_grid.set_label(0, 0, "header")
+    main_grid.set_label(0, 1, "body")
+    main_grid.set_label(0, 2, "footer")
+
+    # Initialises body_grid
+    body_grid = main_grid.get_cell(0, 1)
+    body_grid.set_grid([(2, Unit.CELLS), (100, Unit.PERCENTS)],
+                       [(11, Unit.CELLS), (100, Unit.PERCENTS)])
+    body_grid.set_cell(0, 1, VerticalTabs(0, 0))
+    body_grid.set_cell(1, 0, HorizontalTabs(0, 0))
+    body_grid.set_cell(1, 1, MenuGrid(0, 0))
+    body_grid.set_label(0, 1, "day_tabs")
+    body_grid.set_label(1, 0, "mensa_tabs")
+    body_grid.set_label(1, 1, "menu_grid")
+
+    day_tabs = body_grid.get_cell(0, 1)
+
+    # Fills mensa_tabs with a fixed set of canteens for which the menus can be fetched
+    mensa_tabs = body_grid.get_cell(1, 0)
+    mensa_tabs.set_tabs(list(FORMATTED_TO_RAW_MENSA))
+
+    # Sets the appearance for body_grid and its child widgets
+    body_grid.set_parameters(BODY_PARAMETERS)
+    mensa_tabs.set_parameter("active_background", (96, 96, 96), propagate=False)
+
+    # Fills day_tabs with the days for which the opened canteen has menus
+    set_day_tabs(day_tabs, days, None)
+
+    return main_grid
+
+
+# Replaces the tabs of day_tabs with the given days (see build_ui)
+# The tab of the given date is opened, or of the next day with a menu if it has none
+# (the last day if there is no later one)
+def set_day_tabs(day_tabs: VerticalTabs, days: list[tuple[int, int, int]], date):
+    day_tabs.set_tabs([formatted_date(*day) for day in days] if len(days) != 0 else [NO_DAYS_TEXT])
+    day_tabs.set_parameters(BODY_PARAMETERS)
+    day_tabs.set_parameter("active_background", (96, 96, 96), propagate=False)
+
+    # Setting different background colors for odd and even rows makes them more legible
+    for row in range(len(day_tabs.rows)):
+        day_tabs.get_cell(0, row).set_parameter(
+            "inactive_background", (128, 128, 128) if row % 2 == 0 else (96, 96, 96)
+        )
+
+    if date is None or len(days) == 0:
+        return
+    later = [row for row, day in enumerate(days) if (day[2], day[1], day[0]) >= (date[2], date[1], date[0])]
+    day_tabs.set_opened_cell((0, later[0] if len(later) != 0 else len(days) - 1))
+
+
+# Determines what should be displayed in each sell of the terminal screen
+# Returns the whole frame
+def screen(window: Widget, term: Terminal) -> str:
+    out = []
+    style = None
+    # {character: (escape sequences, text)}, a frame has few distinct characters
+    split_chars = {}
+    for y in range(term.height):
+        for x in range(term.width):
+            char = window.get_char(x, y, term)
+            # Every character is preceded by its escape sequences,
+            # they are only written if they differ from those of the previous character
+            # (a cell covered by a wide character has no text, see textLayout.py)
+            split = split_chars.get(char)
+            if split is None:
+                end = STYLE_PATTERN.match(char).end()
+                split = split_chars[char] = (char[:end], char[end:])
+            if split[0] != style:
+                style = split[0]
+                out.append(char)
+            else:
+                out.append(split[1])
+        out.append('\n')
+    return ''.join(out[:-1])
+
+
+# Formats a price given in cents, e.g. 250 -> "2,50 €"
+# A price of 0 (e.g. for side dishes) is displayed as "-,-- €"
+def format_price(price: int) -> str:
+    return (f"{'-' if price == 0 else price // 100}"
+            ","
+            f"{'-' if price == 0 else price // 10 % 10}"
+            f"{'-' if price == 0 else price % 10} €")
+
+
+# Fills menu_grid with the given data (usually called after a new day or canteen was selected)
+def init_menu_grid(menu_grid: MenuGrid, menu: list[str, str, int]):
+    menu_grid.set_menu(menu)
+
+    # A grid can't have zero rows, so a placeholder is displayed instead
+    if len(menu) == 0:
+        menu = EMPTY_MENU
+
+    # Determines and sets column widths and row heights
+    max_category_width = max([text_width(category) for category, dish, price in menu])
+    menu_grid.set_grid(
+        [(3, Unit.CELLS)] * len(menu),
+        [(max_category_width + 1, Unit.CELLS), (100, Unit.PERCENTS), (6, Unit.CELLS)]
+    )
+
+    # Fills the table with the given data
+    # Since prices are given in cents, they are first formatted before being displayed
+    for row in range(len(menu)):
+        category, dish, price = menu[row]
+        menu_grid.set_cell(0, row, TextLine(0, 0, category))
+        menu_grid.set_cell(1, row, TextLine(0, 0, dish))
+        menu_grid.set_cell(2, row, TextLine(0, 0, format_price(price)))
+
+    # Appearance parameters are set for menu_grid
+    menu_grid.set_parameters(MENU_GRID_PARAMETERS)
+    menu_grid.set_parameter("active_background", (255, 255, 255), propagate=False)
+    stripe_menu_grid(menu_grid, 0)
+
+
+# Setting different background colors for odd and even rows makes them more legible
+# Only the rows from first_row on are restyled
+def stripe_menu_grid(menu_grid: MenuGrid, first_row: int):
+    for row in range(first_row, len(menu_grid.rows)):
+        for column in range(len(menu_grid.columns)):
+            menu_grid.get_cell(column, row).set_parameter(
+                "inactive_background", (255, 255, 255) if row % 2 == 0 else (224, 224, 224)
+            )
+
+
+# Replaces the menu displayed in menu_grid (see init_menu_grid) with the given one
+# Instead of rebuilding the grid, the old and the new menu are diffed row by row:
+# only the texts of changed rows are replaced, and rows are inserted or removed where needed,
+# so the selected row and the scroll offset are kept
+# Inserting and removing rows moves the cursor with its row (see Grid.insert_row). The cursor
+# of an inactive grid isn't displayed, but moving it would scroll the grid (see Grid.update_offset),
+# so it is put back afterwards (onto the last row if the menu got shorter)
+def update_menu_grid(menu_grid: MenuGrid, menu: list[str, str, int]):
+    inactive_cursor = None if menu_grid.active else menu_grid.active_cell
+    old_rows = [tuple(row) for row in menu_grid.menu or EMPTY_MENU]
+    new_rows = [tuple(row) for row in menu or EMPTY_MENU]
+    menu_grid.set_menu(menu)
+
+    # The changes are applied from the end, so the row indices of the earlier changes stay valid
+    first_moved_row = len(old_rows)
+    matcher = SequenceMatcher(None, old_rows, new_rows, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in reversed(matcher.get_opcodes()):
+        if tag == "equal":
+            continue
+
+        replaced = min(old_end - old_start, new_end - new_start)
+        for row in range(replaced):
+            set_menu_row(menu_grid, old_start + row, new_rows[new_start + row])
+        for row in range(old_end - old_start - replaced):
+            menu_grid.remove_row(old_start + replaced)
+        for row in range(new_end - new_start - replaced):
+            menu_grid.insert_row(old_start + replaced + row, 3, Unit.CELLS)
+            for column in range(3):
+                menu_grid.set_cell(column, old_start + replaced + row, TextLine(0, 0))
+                menu_grid.get_cell(column, old_start + replaced + row).set_parameters(MENU_GRID_PARAMETERS)
+            set_menu_row(menu_grid, old_start + replaced + row, new_rows[new_start + replaced + row])
+
+        if old_end - old_start != new_end - new_start:
+            first_moved_row = old_start + replaced
+
+    # Rows after inserted or removed ones have a different parity now
+    stripe_menu_grid(menu_grid, first_moved_row)
+
+    if inactive_cursor is not None:
+        menu_grid.active_cell = (inactive_cursor[0], min(inactive_cursor[1], len(menu_grid.rows) - 1))
+
+    max_category_width = max([text_width(category) for category, dish, price in new_rows])
+    if menu_grid.columns[0] != (max_category_width + 1, Unit.CELLS):
+        menu_grid.set_column_width(0, max_category_width + 1, Unit.CELLS)
+        menu_grid.set_size(menu_grid.width, menu_grid.height)
+
+
+# Sets the texts of a row of menu_grid to the given [category, dish, price], unchanged texts are kept
+def set_menu_row(menu_grid: MenuGrid, row: int, menu_row: tuple[str, str, int]):
+    category, dish, price = menu_row
+    for column, text in enumerate((category, dish, format_price(price))):
+        cell = menu_grid.get_cell(column, row)
+        if cell.get_text() != text:
+            cell.set_text(text)
+
+
+# Fills week_matrix with the menus of several canteens for the whole week
+# weeks - {formatted canteen name: {(day, month, year): menu}} (see stw_parser.get_week)
+# Every cell lists the dishes (without side dishes) with their prices
+def init_week_matrix(week_matrix: WeekMatrix, weeks: dict[str, dict[tuple[int, int, int], list[str, str, int]]]):
+    days = sorted({date for week in weeks.values() for date in week},
+                  key=lambda date: (date[2], date[1], date[0]))
+    width = WeekMatrix.COLUMN_WIDTH - 1
+
+    cells = []
+    for date in days:
+        row = []
+        for week in weeks.values():
+            lines = [shorten(f"{format_price(price)} {dish}", width)
+                     for category, dish, price in week.get(date, [])
+                     if category != "Beilage"]
+            row.append(lines if len(lines) != 0 else ["-"])
+        cells.append(row)
+
+    week_matrix.set_matrix(list(weeks), [formatted_date(*date) for date in days], cells)
+
+
+# Displays the results of a search (see SearchIndex.search) in search_view
+# The first line shows the number of results and the search time in seconds,
+# followed by as many results as fit into the view
+def show_search_results(search_view: SearchView, results: list, search_time: float):
+    lines = [f"{len(results)} results in {search_time * 1000:.1f} ms"]
+    for mensa, date, row, category, dish, price in results[:search_view.get_result_capacity() - 1]:
+        lines.append(f"{formatted_date(*date)}  {formatted_mensa(mensa):<20}  {format_price(price):>7}  "
+                     f"{category}: {dish}")
+    search_view.set_results(lines)
@@ -0,0 +1,43 @@
+import os
+import json
+
+
+# UsageStats counts how often each canteen was opened and stores the counts locally,
+# so that they are kept between sessions (used by the Prefetcher, see prefetcher.py)
+# Attributes:
+# - self.path - str, the path of the JSON file the counts are stored in
+# - self.counts - dict<str, int>, the number of times each canteen (raw name) was opened
+class UsageStats:
+    # The default location of the stored counts
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".mensa", "usage.json")
+
+    def __init__(self, path=None):
+        self.path = path or self.DEFAULT_PATH
+        self.counts = dict()
+        self.load()
+
+    # Reads the stored counts, a missing or broken file is treated as empty
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                counts = json.load(file)
+            self.counts = {mensa: int(count) for mensa, count in counts.items()}
+        except (OSError, ValueError, AttributeError):
+            self.counts = dict()
+
+    # Stores the counts, failures (e.g. a read-only home directory) are ignored
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w', encoding="utf-8") as file:
+                json.dump(self.counts, file)
+        except OSError:
+            pass
+
+    # Counts one opening of the given canteen
+    def record(self, mensa: str):
+        self.counts[mensa] = self.counts.get(mensa, 0) + 1
+
+    # Returns up to n canteens, the most frequently opened first
+    def most_frequent(self, n: int) -> list[str]:
+        return sorted(self.counts, key=lambda mensa: -self.counts[mensa])[:n]
@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import datetime
+import subprocess
+
+from compactWeek import CompactWeek, date_key, key_date
+from searchIndex import matches
+from stw_parser import (fetch_page_if_modified, parse_week, formatted_date, formatted_mensa,
+                        RAW_TO_FORMATTED_MENSA, FETCH_ERRORS)
+
+
+# Hours of the weekdays (0 is Monday) in which the menus are usually published or changed:
+# the menus of the day are completed in the morning, the next week is published at the end of the week
+PUBLICATION_HOURS = {
+    0: range(6, 12),
+    1: range(6, 12),
+    2: range(6, 12),
+    3: range(6, 18),
+    4: range(6, 18)
+}
+
+
+# Watcher polls the weekly pages of some canteens without a UI and reports the dishes
+# matching its rules (e.g. everybody waiting for "Schnitzel" in the Academica)
+# Polling is kept cheap when nothing changes:
+# - pages are requested conditionally (see stw_parser.fetch_page_if_modified),
+# - - so an unchanged page costs a request without a body if the server supports it
+# - a page equal to the previous one (by content hash) isn't parsed
+# - the rules are only checked against the days whose menu changed
+# - the interval between two polls of a canteen doubles after every poll without changes
+# - - (up to MAX_INTERVAL), but is at most PUBLICATION_INTERVAL in PUBLICATION_HOURS,
+# - - and polling resumes when these hours begin
+# A dish is reported once per rule, canteen and day. Matches are printed to the output
+# and passed to the hook command, if there is one, in environment variables:
+# MENSA_CANTEEN, MENSA_DATE, MENSA_CATEGORY, MENSA_DISH, MENSA_PRICE (in cents) and MENSA_RULE
+# With a state file, the validators, the content hashes and the reported matches are kept between runs
+# (e.g. of "--once" in cron jobs), so unchanged pages aren't downloaded and matches aren't reported again
+# The reported matches are kept for every rule, but the validators and hashes are only used by the same
+# rules: with other rules, the pages have to be downloaded and checked again
+# Attributes:
+# - self.rules - [(str, [str])], the rules: the query (see searchIndex.matches)
+# - - and the canteens (raw names) it applies to
+# - self.mensas - [str], the polled canteens (all canteens of the rules)
+# - self.hook - str, the shell command run for every match (None if there is none)
+# - self.output - file, where the matches are printed
+# - self.matchers - [function(str) -> bool], the compiled queries of the rules
+# - self.validators - dict<str, dict>, the validators of the last download of each canteen's page
+# - self.digests - dict<str, bytes>, the content hash of each canteen's last page
+# - self.weeks - dict<str, CompactWeek>, the last week of each canteen
+# - self.intervals - dict<str, float>, the current polling interval of each canteen in seconds
+# - self.due - dict<str, float>, the Unix time of the next poll of each canteen
+# - self.reported - set<(str, int, str, str)>, the reported (canteen, date ordinal, dish, query)
+# - self.state_path - str, the path of the JSON file the state is kept in (None if there is none)
+class Watcher:
+    # Seconds between two polls after a change
+    MIN_INTERVAL = 5 * 60
+
+    # Maximal seconds between two polls
+    MAX_INTERVAL = 2 * 60 * 60
+
+    # Maximal seconds between two polls in PUBLICATION_HOURS
+    PUBLICATION_INTERVAL = 10 * 60
+
+    # Seconds a hook command may run
+    HOOK_TIMEOUT = 30
+
+    def __init__(self, rules: list[tuple[str, list[str]]], hook=None, output=None, state_path=None):
+        self.rules = rules
+        self.mensas = [mensa for mensa in RAW_TO_FORMATTED_MENSA if any(mensa in mensas for query, mensas in rules)]
+        self.hook = hook
+        self.output = output or sys.stdout
+        self.matchers = [matches(query) for query, mensas in rules]
+        self.validators = {mensa: dict() for mensa in self.mensas}
+        self.digests = dict()
+        self.weeks = {mensa: CompactWeek() for mensa in self.mensas}
+        self.intervals = {mensa: self.MIN_INTERVAL for mensa in self.mensas}
+        self.due = {mensa: 0.0 for mensa in self.mensas}
+        self.reported = set()
+        self.state_path = state_path
+        self.load_state()
+
+    # Reads the state of a previous run, a missing or broken file is ignored
+    def load_state(self):
+        if self.state_path is None:
+            return
+        try:
+            with open(self.state_path, encoding="utf-8") as file:
+                state = json.load(file)
+            reported = {(mensa, int(ordinal), dish, query) for mensa, ordinal, dish, query in state["reported"]
+                        if mensa in self.mensas}
+            validators = {mensa: dict(state["validators"].get(mensa, {})) for mensa in self.mensas}
+            digests = {mensa: bytes.fromhex(digest) for mensa, digest in state["digests"].items()
+                       if mensa in self.mensas}
+            same_rules = state["rules"] == [[query, mensas] for query, mensas in self.rules]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return
+        self.reported = reported
+        if same_rules:
+            self.validators, self.digests = validators, digests
+
+    # Stores the state, failures (e.g. a read-only directory) are reported, but don't stop the watcher
+    # The file is replaced at once, so a run starting at the same time never reads half of it
+    def save_state(self):
+        if self.state_path is None:
+            return
+        state = {
+            "rules": [[query, mensas] for query, mensas in self.rules],
+            "validators": self.validators,
+            "digests": {mensa: digest.hex() for mensa, digest in self.digests.items()},
+            "reported": sorted(self.reported)
+        }
+        try:
+            directory = os.path.dirname(self.state_path)
+            if directory != "":
+                os.makedirs(directory, exist_ok=True)
+            with open(self.state_path + ".tmp", 'w', encoding="utf-8") as file:
+                json.dump(state, file)
+            os.replace(self.state_path + ".tmp", self.state_path)
+        except OSError as error:
+            print(f"state: {error}", file=sys.stderr)
+
+    # Polls the canteens whenever they are due, forever or (if once is set) only once
+    # The state is stored after every round of polls
+    def run(self, once=False):
+        while True:
+            for mensa in self.mensas:
+                if self.due[mensa] <= time.time():
+                    try:
+                        changed = self.poll(mensa)
+                    except FETCH_ERRORS as error:
+                        print(f"{formatted_mensa(mensa)}: {error}", file=sys.stderr)
+                        changed = False
+                    self.due[mensa] = self.next_poll(mensa, changed, time.time())
+            self.save_state()
+            if once:
+                return
+            time.sleep(max(0.0, min(self.due.values()) - time.time()))
+
+    # Downloads the page of the given canteen if it changed and checks the rules against the changed days
+    # Returns True if a day changed
+    def poll(self, mensa: str) -> bool:
+        page, self.validators[mensa] = fetch_page_if_modified(mensa, self.validators[mensa])
+        if page is None:
+            return False
+        digest = hashlib.blake2b(page, digest_size=16).digest()
+        if digest == self.digests.get(mensa):
+            return False
+        self.digests[mensa] = digest
+
+        week = parse_week([page])
+        changed = [(date, menu) for date, menu in week.items() if self.weeks[mensa].get(date) != menu]
+        self.weeks[mensa] = week
+        # Days that left the page are forgotten
+        self.reported = {entry for entry in self.reported if entry[0] != mensa or key_date(entry[1]) in week}
+
+        for date, menu in changed:
+            self.check(mensa, date, menu)
+        return len(changed) != 0
+
+    # Reports the dishes of the given menu that match a rule for the canteen and weren't reported yet
+    def check(self, mensa: str, date: tuple[int, int, int], menu):
+        ordinal = date_key(date)
+        for (query, mensas), matcher in zip(self.rules, self.matchers):
+            if mensa not in mensas:
+                continue
+            for category, dish, price in menu:
+                if (mensa, ordinal, dish, query) not in self.reported and matcher(f"{category} {dish}"):
+                    self.reported.add((mensa, ordinal, dish, query))
+                    self.report(mensa, date, category, dish, price, query)
+
+    # Prints a match and runs the hook command for it
+    def report(self, mensa: str, date: tuple[int, int, int], category: str, dish: str, price: int, query: str):
+        print(f"{formatted_date(*date)}  {formatted_mensa(mensa)}  {price / 100:.2f} €  {category}: {dish}"
+              f"  [{query}]", file=self.output, flush=True)
+        if self.hook is None:
+            return
+
+        # The texts are passed in the environment, so they can't be interpreted by the shell
+        environment = dict(os.environ, MENSA_CANTEEN=formatted_mensa(mensa), MENSA_DATE=formatted_date(*date),
+                           MENSA_CATEGORY=category, MENSA_DISH=dish, MENSA_PRICE=str(price), MENSA_RULE=query)
+        try:
+            subprocess.run(self.hook, shell=True, env=environment, timeout=self.HOOK_TIMEOUT)
+        except (OSError, subprocess.SubprocessError) as error:
+            print(f"hook: {error}", file=sys.stderr)
+
+    # Returns the Unix time of the next poll of the given canteen after a poll at now
+    def next_poll(self, mensa: str, changed: bool, now: float) -> float:
+        interval = self.MIN_INTERVAL if changed else min(self.MAX_INTERVAL, self.intervals[mensa] * 2)
+        self.intervals[mensa] = interval
+        if in_publication_hours(now):
+            return now + min(interval, self.PUBLICATION_INTERVAL)
+        return min(now + interval, next_publication_start(now))
+
+
+def in_publication_hours(now: float) -> bool:
+    moment = datetime.datetime.fromtimestamp(now)
+    return moment.hour in PUBLICATION_HOURS.get(moment.weekday(), ())
+
+
+# Returns the Unix time at which the next PUBLICATION_HOURS begin after now
+def next_publication_start(now: float) -> float:
+    moment = datetime.datetime.fromtimestamp(now).replace(minute=0, second=0, microsecond=0)
+    for hour in range(1, 8 * 24):
+        start = moment + datetime.timedelta(hours=hour)
+        if in_publication_hours(start.timestamp()) and not in_publication_hours(start.timestamp() - 3600):
+            return start.timestamp()
+    return now + Watcher.MAX_INTERVAL
+
+
+# Parses a rule given as "QUERY" (for all canteens) or "QUERY@CANTEEN,CANTEEN" (raw canteen names)
+def parse_rule(text: str) -> tuple[str, list[str]]:
+    query, separator, canteens = text.partition('@')
+    mensas = [mensa.strip() for mensa in canteens.split(',')] if separator else list(RAW_TO_FORMATTED_MENSA)
+    unknown = [mensa for mensa in mensas if mensa not in RAW_TO_FORMATTED_MENSA]
+    if len(unknown) != 0 or query.strip() == "":
+        raise argparse.ArgumentTypeError(f"invalid rule: {text} (canteens: {', '.join(RAW_TO_FORMATTED_MENSA)})")
+    return query.strip(), mensas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watches the STW Aachen menus for dishes")
+    parser.add_argument("rules", metavar="RULE", nargs='+', type=parse_rule,
+                        help="words contained in the wanted dishes, optionally followed by @ and "
+                             "the canteens to watch, e.g. \"schnitzel@academica,vita\" (default: all canteens)")
+    parser.add_argument("--hook", metavar="COMMAND",
+                        help="shell command run for every match, it gets the match in the environment variables "
+                             "MENSA_CANTEEN, MENSA_DATE, MENSA_CATEGORY, MENSA_DISH, MENSA_PRICE and MENSA_RULE")
+    parser.add_argument("--once", action="store_true",
+                        help="polls every canteen once and exits (e.g. for cron jobs, together with --state)")
+    parser.add_argument("--state", metavar="FILE",
+                        help="keeps the downloaded pages' validators and hashes and the reported matches in FILE "
+                             "between runs, so matches are reported once across runs")
+    arguments = parser.parse_args()
+
+    try:
+        Watcher(arguments.rules, arguments.hook, state_path=arguments.state).run(arguments.once)
+    except KeyboardInterrupt:
+        pass
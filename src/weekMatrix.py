@@ -0,0 +1,142 @@
+from bisect import bisect_right
+
+from grid import Grid
+from textLine import TextLine
+from textBlock import TextBlock
+from textLayout import text_width
+from enums import Unit, CursorMoveResult
+from blessed import Terminal
+
+
+# WeekMatrix is a Grid that displays a matrix of text blocks with labelled rows and columns
+# (used for comparing the menus of all canteens for the whole week: canteens are columns,
+# days are rows and every cell contains a summary of the dishes)
+# The first row and the first column contain the labels. They stay in place
+# while the rest of the matrix is scrolled, and the cursor never enters them
+# The matrix uses viewport virtualization: only the cells inside the visible part
+# are updated, and the cell for a coordinate is found by binary search,
+# so the cost of a frame doesn't grow with the size of the matrix
+# Parameters:
+# - label_background - (int, int, int), the background color of the labels
+# - label_text - (int, int, int), the foreground color of the labels
+class WeekMatrix(Grid):
+    # The width of the columns with cells, in cells
+    COLUMN_WIDTH = 32
+
+    def __init__(self, width: int, height: int):
+        super().__init__(width, height)
+        self.parameters["label_background"] = (96, 96, 96)
+        self.parameters["label_text"] = (255, 255, 255)
+        self.set_cell(0, 0, TextLine(0, 0, "Loading..."))
+
+    # Fills the matrix
+    # cells[row][column] is the list of lines displayed in the cell for the given row and column label
+    def set_matrix(self, column_labels: list[str], row_labels: list[str], cells: list[list[list[str]]]):
+        label_width = max([text_width(label) for label in row_labels], default=0) + 1
+        row_heights = [max([len(cell) for cell in row], default=0) + 1 for row in cells]
+        self.set_grid([(1, Unit.CELLS)] + [(height, Unit.CELLS) for height in row_heights],
+                      [(label_width, Unit.CELLS)] + [(self.COLUMN_WIDTH, Unit.CELLS)] * len(column_labels))
+
+        self.set_cell(0, 0, TextLine(0, 0, ""))
+        for column in range(len(column_labels)):
+            self.set_cell(column + 1, 0, TextLine(0, 0, column_labels[column]))
+        for row in range(len(row_labels)):
+            self.set_cell(0, row + 1, TextLine(0, 0, row_labels[row]))
+            for column in range(len(column_labels)):
+                self.set_cell(column + 1, row + 1, TextBlock(0, 0, cells[row][column]))
+
+        self.x_offset = 0
+        self.y_offset = 0
+        if self.active:
+            self.set_active_cell(self.first_cell())
+        else:
+            self.active_cell = self.first_cell()
+        self.set_parameters(self.parameters)
+
+    # Returns the top-left cell the cursor may enter
+    def first_cell(self) -> tuple[int, int]:
+        return min(1, len(self.columns) - 1), min(1, len(self.rows) - 1)
+
+    # Sets new parameter values for given parameter keys
+    # The labels are always displayed with the label colors
+    def set_parameters(self, parameters: dict, propagate=True):
+        super().set_parameters(parameters, propagate)
+        if not propagate:
+            return
+
+        label_parameters = {
+            "active_background": self.parameters["label_background"],
+            "inactive_background": self.parameters["label_background"],
+            "active_text": self.parameters["label_text"],
+            "inactive_text": self.parameters["label_text"]
+        }
+        for column in range(len(self.columns)):
+            self.get_cell(column, 0).set_parameters(label_parameters)
+        for row in range(len(self.rows)):
+            self.get_cell(0, row).set_parameters(label_parameters)
+
+    # When being activated, the cursor is placed on the first cell instead of a label
+    def set_active(self, new_active: bool):
+        super().set_active(new_active)
+        if new_active:
+            self.set_active_cell(self.first_cell())
+
+    # Moves the cursor between the cells
+    # Moving into the labels propagates the movement to the parent widget
+    def move_cursor(self, key_name: str) -> CursorMoveResult:
+        active_x, active_y = self.active_cell
+        first_x, first_y = self.first_cell()
+        if key_name == "KEY_LEFT" and active_x == first_x:
+            return CursorMoveResult.MOVED_LEFT
+        if key_name == "KEY_UP" and active_y == first_y:
+            return CursorMoveResult.MOVED_UP
+        return super().move_cursor(key_name)
+
+    # Updates the offsets and forwards the update to the visible children only
+    def update(self):
+        self.update_offset()
+
+        for row in [0] + self.visible_range(self.pref_heights, self.y_offset, self.height):
+            for column in [0] + self.visible_range(self.pref_widths, self.x_offset, self.width):
+                self.widget_grid[row][column].update()
+
+    # Returns the indices of the rows (or columns) after the labels that are visible
+    # with the given prefix sizes, offset and size of the viewport
+    @staticmethod
+    def visible_range(prefix_sizes: list[int], offset: int, size: int) -> list[int]:
+        first = bisect_right(prefix_sizes, offset + prefix_sizes[0])
+        last = bisect_right(prefix_sizes, offset + size - 1)
+        return list(range(max(first, 1), min(last + 1, len(prefix_sizes))))
+
+    # Updates the offsets so that the active cell is visible below and to the right of the labels
+    def update_offset(self):
+        active_x, active_y = self.active_cell
+
+        top = self.pref_heights[active_y - 1] if active_y != 0 else 0
+        if self.pref_heights[active_y] > self.y_offset + self.height:
+            self.y_offset = self.pref_heights[active_y] - self.height
+        if top - self.pref_heights[0] < self.y_offset:
+            self.y_offset = max(0, top - self.pref_heights[0])
+
+        left = self.pref_widths[active_x - 1] if active_x != 0 else 0
+        if self.pref_widths[active_x] > self.x_offset + self.width:
+            self.x_offset = self.pref_widths[active_x] - self.width
+        if left - self.pref_widths[0] < self.x_offset:
+            self.x_offset = max(0, left - self.pref_widths[0])
+
+    # Returns the character that is to be displayed at the coordinates (x, y)
+    # The labels are not affected by the offsets
+    def get_char(self, x: int, y: int, term: Terminal) -> str:
+        if y >= self.pref_heights[0]:
+            y += self.y_offset
+        if x >= self.pref_widths[0]:
+            x += self.x_offset
+
+        if x < 0 or y < 0 or y >= self.pref_heights[-1] or x >= self.pref_widths[-1]:
+            return term.on_color_rgb(*self.parameters[("" if self.active else "in") + "active_background"]) + ' '
+
+        row = bisect_right(self.pref_heights, y)
+        column = bisect_right(self.pref_widths, x)
+        return self.widget_grid[row][column].get_char(x - (self.pref_widths[column - 1] if column > 0 else 0),
+                                                      y - (self.pref_heights[row - 1] if row > 0 else 0),
+                                                      term)